@@ -0,0 +1,95 @@
+"""Pack several entities into one config file to cut the number of OnboardBuilding calls.
+
+A unit is one entity plus the copied link targets it needs; units are never
+split across files. Units are packed in order (next-fit) so file contents
+stay deterministic for a given export and budget.
+"""
+import os
+import run_state
+import yaml_blocks
+
+
+class PackingBudget:
+    """Upper bounds for one packed file; None means unbounded."""
+
+    def __init__(self, max_entities=1, max_bytes=None, max_links=None):
+        self.max_entities = max_entities
+        self.max_bytes = max_bytes
+        self.max_links = max_links
+
+    def __repr__(self):
+        return (f"PackingBudget(max_entities={self.max_entities}, max_bytes={self.max_bytes}, "
+                f"max_links={self.max_links})")
+
+    def fits(self, entities, size, links):
+        return ((self.max_entities is None or entities <= self.max_entities)
+                and (self.max_bytes is None or size <= self.max_bytes)
+                and (self.max_links is None or links <= self.max_links))
+
+
+def pack_units(units, budget):
+    """Group units into files.
+
+    units is a sequence of (payload, size, links) tuples where size is the unit's serialized
+    byte count and links its number of links. Returns a list of lists of payloads. A unit that
+    exceeds the budget on its own still gets a file to itself.
+    """
+    groups = []
+    current, entities, size, links = [], 0, 0, 0
+    for payload, unit_size, unit_links in units:
+        if current and not budget.fits(entities + 1, size + unit_size, links + unit_links):
+            groups.append(current)
+            current, entities, size, links = [], 0, 0, 0
+        current.append(payload)
+        entities += 1
+        size += unit_size
+        links += unit_links
+    if current:
+        groups.append(current)
+    return groups
+
+
+def config_shape(config_path):
+    """(entities, body_bytes) of a split config file, leaving out CONFIG_METADATA and the building.
+
+    body_bytes counts the rendered entity blocks only, the same measure pack_units is given for units.
+    """
+    with open(config_path, "rb") as f:
+        blocks = list(yaml_blocks.iter_top_level_blocks(f))
+    entity_blocks = blocks[2:]
+    return len(entity_blocks), sum(length for _, length in entity_blocks)
+
+
+def timed_out_configs(base_dir):
+    """(config_path, entity_count, body_bytes) of every file recorded as timed out in base_dir/results.
+
+    The shape is recorded when the timeout happens (see run_state), so it still describes the
+    file that was sent after that file has been repacked or rewritten.
+    """
+    results_root = os.path.join(base_dir, "results")
+    if not os.path.isfile(os.path.join(results_root, run_state.DB_NAME)):
+        return []
+    return run_state.open_store(results_root).timeouts()
+
+
+def adapt_budget(budget, base_dir):
+    """Shrink a budget to half of the smallest file that has timed out in an earlier run."""
+    timed_out = timed_out_configs(base_dir)
+    if not timed_out:
+        return budget
+
+    smallest_entities = min(count for _, count, _ in timed_out)
+    smallest_bytes = min(size for _, _, size in timed_out)
+    max_entities = max(1, smallest_entities // 2)
+    if budget.max_entities is not None:
+        max_entities = min(budget.max_entities, max_entities)
+    max_bytes = smallest_bytes // 2
+    if budget.max_bytes is not None:
+        max_bytes = min(budget.max_bytes, max_bytes)
+    max_links = budget.max_links
+    if max_links is not None and budget.max_entities:
+        max_links = max(1, max_links * max_entities // budget.max_entities)
+
+    adapted = PackingBudget(max_entities, max_bytes, max_links)
+    print(f"{len(timed_out)} config file(s) timed out previously; shrinking packing budget to {adapted}")
+    return adapted
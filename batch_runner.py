@@ -0,0 +1,206 @@
+"""Process and onboard many buildings from a job file, without prompts.
+
+The job file is YAML (or JSON):
+
+    defaults:                  # optional, applied to every building
+      onboard_workers: 4       # files onboarded in parallel per building
+      max_entities: null       # pack this many entities per file (see batch_packing)
+      group_links: false       # group virtual entities that share links (see link_graph)
+      streaming: false         # use process_file_streaming
+      process: true            # run process_ABEL_output
+      onboard: true            # run execute_API_calls_series
+    buildings:
+      - building_code: US-XXX-YYY
+        export: /abs/path/abel_export.yaml
+        building_config: /abs/path/building_config.yaml   # optional; cached export if omitted
+
+Usage: python3 batch_runner.py jobs.yaml [--parallel N] [--rate CALLS_PER_SEC] [--report PATH]
+
+Up to --parallel buildings run at once, each in its own process, and
+--rate is shared between them. Each building's output goes to
+batch_<building_code>.log next to its export. A combined report is printed
+and written as JSON.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from yaml_io import load_yaml_file
+
+CATEGORY_FOLDERS = ("update_reporting_entities", "update_virtual_entities", "add_virtual_entities")
+
+JOB_DEFAULTS = {
+    "building_config": None,
+    "onboard_workers": 1,
+    "max_entities": None,
+    "group_links": False,
+    "streaming": False,
+    "process": True,
+    "onboard": True,
+}
+
+
+def load_jobs(job_file):
+    """Read a job file into a list of job dicts with defaults applied."""
+    spec = load_yaml_file(job_file)
+    if not isinstance(spec, dict) or not isinstance(spec.get("buildings"), list):
+        raise ValueError(f"{job_file}: expected a mapping with a 'buildings' list")
+    defaults = dict(JOB_DEFAULTS, **(spec.get("defaults") or {}))
+    jobs = []
+    for i, entry in enumerate(spec["buildings"], start=1):
+        if not isinstance(entry, dict) or not entry.get("building_code") or not entry.get("export"):
+            raise ValueError(f"{job_file}: building #{i} needs building_code and export")
+        jobs.append(dict(defaults, **entry))
+    return jobs
+
+
+def split_config_files(export_path):
+    """Config files process_ABEL_output wrote next to an export, in onboarding order."""
+    base_dir = os.path.dirname(export_path)
+    config_files = []
+    for folder in CATEGORY_FOLDERS:
+        folder_path = os.path.join(base_dir, folder)
+        if os.path.isdir(folder_path):
+            config_files += sorted(os.path.join(folder_path, name) for name in os.listdir(folder_path)
+                                   if name.endswith(".yaml"))
+    return config_files
+
+
+def run_job(job, rate=None):
+    """Process and onboard one building; returns its report entry. Runs in a pool worker."""
+    import batch_packing
+    import execute_API_calls_series
+    import export_cache
+    import process_ABEL_output
+    import rate_limiter
+
+    code = job["building_code"]
+    export_path = job["export"]
+    report = {"building_code": code, "export": export_path, "status": "ok", "files": 0,
+              "succeeded": 0, "failed": 0, "failed_files": [], "error": None}
+    log_path = os.path.join(os.path.dirname(export_path), f"batch_{code}.log")
+    report["log"] = log_path
+    start = time.perf_counter()
+
+    with open(log_path, "a", encoding="utf-8") as log, contextlib.redirect_stdout(log), \
+            contextlib.redirect_stderr(log):
+        print(f"\n=== {time.strftime('%Y-%m-%d %H:%M:%S')} batch run for {code} ===")
+        try:
+            if not os.path.isfile(export_path):
+                raise FileNotFoundError(f"Export not found: {export_path}")
+
+            if job["process"]:
+                process_start = time.perf_counter()
+                if job["streaming"]:
+                    process_ABEL_output.process_file_streaming(export_path)
+                else:
+                    budget = (batch_packing.PackingBudget(int(job["max_entities"]))
+                              if job["max_entities"] else None)
+                    # Buildings already run in parallel processes; don't nest a second pool
+                    process_ABEL_output.process_file(export_path, workers=1, budget=budget,
+                                                     group_links=job["group_links"])
+                report["processing_seconds"] = round(time.perf_counter() - process_start, 1)
+
+            config_files = split_config_files(export_path)
+            report["files"] = len(config_files)
+
+            if job["onboard"] and config_files:
+                building_config = job["building_config"] or export_cache.get_building_config(code)
+                if not building_config or not os.path.isfile(building_config):
+                    raise FileNotFoundError(f"Building config not available for {code}")
+                limiter = rate_limiter.TokenBucket(rate) if rate else None
+                onboard_start = time.perf_counter()
+                # As above, pre-flight checks stay in this process rather than starting a pool
+                result_files = execute_API_calls_series.onboard_config_files(
+                    code, config_files, building_config,
+                    max_workers=int(job["onboard_workers"]), limiter=limiter, preflight_workers=1)
+                succeeded, failed_files, _ = execute_API_calls_series.summarize_results(result_files)
+                report.update(succeeded=succeeded, failed=len(failed_files), failed_files=failed_files,
+                              onboarding_seconds=round(time.perf_counter() - onboard_start, 1))
+                if failed_files:
+                    report["status"] = "failed"
+        except SystemExit as e:
+            # The processing and export code reports fatal problems with sys.exit
+            report.update(status="error", error=f"exited with status {e.code}; see {log_path}")
+        except Exception as e:
+            report.update(status="error", error=repr(e))
+            print(f"ERROR: {e!r}")
+
+    report["seconds"] = round(time.perf_counter() - start, 1)
+    return report
+
+
+def run_batch(jobs, parallel=1, rate=None):
+    """Run jobs with at most `parallel` buildings at a time; returns report entries in job order.
+
+    rate (stubby calls per second) is split evenly between the buildings running at once.
+    """
+    parallel = max(1, min(parallel, len(jobs)))
+    per_building_rate = rate / parallel if rate else None
+    reports = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=parallel) as executor:
+        futures = {executor.submit(run_job, job, per_building_rate): i for i, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                reports[i] = future.result()
+            except Exception as e:
+                reports[i] = {"building_code": jobs[i]["building_code"], "export": jobs[i]["export"],
+                              "status": "error", "error": repr(e)}
+            entry = reports[i]
+            print(f"[{done}/{len(jobs)}] {entry['building_code']}: {entry['status']}"
+                  + (f" ({entry['succeeded']}/{entry['files']} files onboarded)" if entry.get("files") else ""))
+    return reports
+
+
+def print_report(reports):
+    print("\n===== BATCH SUMMARY =====")
+    for entry in reports:
+        icon = {"ok": "✅", "failed": "⚠️", "error": "❌"}[entry["status"]]
+        line = f"{icon} {entry['building_code']}: {entry['status']}"
+        if entry.get("files"):
+            line += f", {entry['succeeded']}/{entry['files']} files onboarded"
+        if entry.get("seconds") is not None:
+            line += f" in {entry['seconds']}s"
+        print(line)
+        if entry.get("error"):
+            print(f"    {entry['error']}")
+        for name in entry.get("failed_files", []):
+            print(f"    - {name}")
+    totals = {status: sum(1 for e in reports if e["status"] == status) for status in ("ok", "failed", "error")}
+    print(f"\nBuildings: {totals['ok']} ok, {totals['failed']} with failed files, {totals['error']} errored")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("job_file")
+    parser.add_argument("--parallel", type=int, default=2, help="buildings processed at the same time")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="max stubby calls per second across all buildings (default unlimited)")
+    parser.add_argument("--report", help="where to write the JSON report (default: next to the job file)")
+    args = parser.parse_args()
+
+    try:
+        jobs = load_jobs(args.job_file)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    reports = run_batch(jobs, parallel=args.parallel, rate=args.rate)
+    print_report(reports)
+
+    report_path = args.report or os.path.splitext(os.path.abspath(args.job_file))[0] + "_report.json"
+    with open(report_path, "w") as f:
+        json.dump({"job_file": os.path.abspath(args.job_file), "seconds": round(time.perf_counter() - start, 1),
+                   "buildings": reports}, f, indent=2)
+    print(f"Report written to {report_path}")
+    sys.exit(0 if all(entry["status"] == "ok" for entry in reports) else 1)
+
+
+if __name__ == "__main__":
+    main()
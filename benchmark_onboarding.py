@@ -0,0 +1,163 @@
+"""End-to-end onboarding throughput against the local fake_stubby stand-in.
+
+Generates a synthetic building, splits it with process_ABEL_output, and
+onboards every split file through execute_API_calls_series using
+fake_stubby.py instead of the real service. Reports wall time, files/hour
+and the number of stubby calls per RPC.
+
+Usage: python3 benchmark_onboarding.py [--entities N] [--workers W] [--running MIN MAX] ...
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import execute_API_calls_series
+import export_building_config
+import generate_synthetic_export
+import onboard_retry
+import onboard_scheduler
+import operation_poller
+import pipeline
+import process_ABEL_output
+import run_state
+import stubby_transport
+import telemetry
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def scaled_policy(base, scale):
+    return operation_poller.PollPolicy(
+        initial_delay=base.initial_delay * scale, min_delay=base.min_delay * scale,
+        max_delay=base.max_delay * scale, factor=base.factor, jitter=base.jitter, deadline=base.deadline)
+
+
+class UnorderedScheduler(onboard_scheduler.DependencyScheduler):
+    """--no-dependencies: every file is submitted as soon as it is added."""
+
+    def add(self, key, guids, *args):
+        super().add(key, (), *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=200, help="reporting entities in the synthetic building")
+    parser.add_argument("--workers", type=int, default=8, help="files onboarded in parallel")
+    parser.add_argument("--rate", type=float, default=None, help="max stubby calls per second (default unlimited)")
+    parser.add_argument("--latency", type=float, nargs=2, default=[0.05, 0.02], metavar=("MEAN", "STDDEV"),
+                        help="seconds per stubby call")
+    parser.add_argument("--running", type=float, nargs=2, default=[1.0, 3.0], metavar=("MIN", "MAX"),
+                        help="seconds an operation stays running")
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--stale-etag-rate", type=float, default=0.0)
+    parser.add_argument("--report-etags", action="store_true",
+                        help="have onboard results report new etags instead of forcing re-exports")
+    parser.add_argument("--check-etags", action="store_true",
+                        help="fail onboards whose etags another operation replaced meanwhile (implies --report-etags)")
+    parser.add_argument("--no-dependencies", action="store_true",
+                        help="onboard files in any order instead of waiting for files with the same entities")
+    parser.add_argument("--poll-scale", type=float, default=0.1,
+                        help="multiplier applied to the onboarding poll policy delays")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="stream split files straight into onboarding (pipeline.py) instead of "
+                             "processing everything first")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="abel_onboarding_bench_")
+    export_path = os.path.join(work_dir, "abel_export.yaml")
+    generate_synthetic_export.write_export(export_path, reporting=args.entities)
+
+    os.environ[stubby_transport.STUBBY_ENV] = f"{sys.executable} {os.path.join(HERE, 'fake_stubby.py')}"
+    os.environ["FAKE_STUBBY_STATE"] = os.path.join(work_dir, "fake_stubby_state")
+    os.environ["FAKE_STUBBY_CONFIG"] = json.dumps({
+        "call_latency": args.latency,
+        "running_seconds": args.running,
+        "timeout_rate": args.timeout_rate,
+        "failure_rate": args.failure_rate,
+        "stale_etag_rate": args.stale_etag_rate,
+        "export_source": export_path,
+        "report_etags": args.report_etags or args.check_etags,
+        "check_etags": args.check_etags,
+    })
+
+    execute_API_calls_series.ONBOARD_POLL_POLICY = scaled_policy(execute_API_calls_series.ONBOARD_POLL_POLICY,
+                                                                 args.poll_scale)
+    export_building_config.EXPORT_POLL_POLICY = scaled_policy(export_building_config.EXPORT_POLL_POLICY,
+                                                              args.poll_scale)
+    if args.no_dependencies:
+        onboard_scheduler.DependencyScheduler = UnorderedScheduler
+    base_retry = execute_API_calls_series.RETRY_POLICY
+    retry_policy = onboard_retry.RetryPolicy(max_retries=base_retry.max_retries,
+                                             base_delay=base_retry.base_delay * args.poll_scale,
+                                             factor=base_retry.factor, max_delay=base_retry.max_delay * args.poll_scale)
+    breaker = onboard_retry.CircuitBreaker(cooldown=120 * args.poll_scale)
+
+    limiter = None
+    if args.rate:
+        import rate_limiter
+        limiter = rate_limiter.TokenBucket(args.rate)
+
+    first_onboard = []
+
+    def note_first_onboard(name):
+        if name == "stubby.OnboardBuilding" and not first_onboard:
+            first_onboard.append(time.perf_counter())
+
+    telemetry.add_span_hook(note_first_onboard)
+    stubby_transport.reset_counts()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.pipeline:
+            onboard_start = start
+            result_files = pipeline.run_pipeline(export_path, "US-BNC-BENCH", export_path, max_workers=args.workers,
+                                                 limiter=limiter, retry_policy=retry_policy, breaker=breaker)
+        else:
+            process_ABEL_output.process_file(export_path)
+            config_files = []
+            for folder in ("update_reporting_entities", "update_virtual_entities", "add_virtual_entities"):
+                folder_path = os.path.join(work_dir, folder)
+                config_files += sorted(os.path.join(folder_path, name) for name in os.listdir(folder_path))
+            onboard_start = time.perf_counter()
+            result_files = execute_API_calls_series.onboard_config_files(
+                "US-BNC-BENCH", config_files, export_path, max_workers=args.workers, limiter=limiter,
+                retry_policy=retry_policy, breaker=breaker)
+    end = time.perf_counter()
+    wall = end - onboard_start
+    config_files = [cfg for _, cfg, _ in result_files]
+
+    store = run_state.open_store(os.path.join(work_dir, "results"))
+    rows = store.statuses(cfg for _, cfg, _ in result_files)
+    succeeded = sum(1 for row in rows.values() if row["status"] == run_state.SUCCEEDED)
+    results = {
+        "entities": args.entities,
+        "files": len(config_files),
+        "workers": args.workers,
+        "succeeded": succeeded,
+        "failed": len(config_files) - succeeded,
+        "wall_seconds": round(wall, 2),
+        "end_to_end_seconds": round(end - start, 2),
+        "first_onboard_seconds": round(first_onboard[0] - start, 2) if first_onboard else None,
+        "files_per_hour": round(len(config_files) / wall * 3600, 1),
+        "attempts": sum(row["attempts"] for row in rows.values()),
+        "breaker_trips": breaker.trips,
+        "stubby_calls": dict(stubby_transport.call_counts),
+        "re_exports": stubby_transport.call_counts["ExportBuildingConfig"],
+        "poll_calls_per_file": round(stubby_transport.call_counts["GetOperation"] / max(1, len(config_files)), 2),
+        "work_dir": work_dir,
+    }
+    for key, value in results.items():
+        print(f"{key:>20}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Per-phase timing and peak memory of ABEL processing on synthetic exports.
+
+For each export size, runs the process_file phases one by one (load,
+categorize_guids, expand_links, header render, split/write), then the
+streaming mode and split_large_configs.split_config_file as a whole.
+Each phase records wall time and tracemalloc peak. Results are written
+as JSON so runs from different versions can be compared.
+
+Usage: python3 benchmark_processing.py [--sizes 1000 10000] [--out DIR] [--no-tracemalloc]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import generate_synthetic_export
+import process_ABEL_output
+import split_large_configs
+import yaml_io
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class PhaseTimer:
+    def __init__(self, track_memory):
+        self.track_memory = track_memory
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if self.track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = None
+            if self.track_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self.phases[name] = {"seconds": round(elapsed, 4),
+                                 "peak_bytes": peak}
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_size(reporting, fan_out, track_memory):
+    work_dir = tempfile.mkdtemp(prefix="abel_processing_bench_")
+    try:
+        export_path = os.path.join(work_dir, "abel_export.yaml")
+        generate_synthetic_export.write_export(export_path, reporting=reporting, fan_out=fan_out)
+        timer = PhaseTimer(track_memory)
+
+        # Mirrors the steps of process_ABEL_output.process_file
+        with timer.phase("load"):
+            config = yaml_io.load_yaml_file(export_path)
+        config_metadata = config.get("CONFIG_METADATA", {"operation": "UPDATE"})
+        building_guid, building_content = next(
+            (guid, content) for guid, content in config.items()
+            if isinstance(content, dict) and content.get("type") == "FACILITIES/BUILDING")
+        pool = {k: v for k, v in config.items() if k not in ("CONFIG_METADATA", building_guid)}
+
+        with timer.phase("categorize_guids"):
+            update_reporting, update_virtual, add_virtual, _ = process_ABEL_output.categorize_guids(pool)
+        with timer.phase("expand_links"):
+            process_ABEL_output.expand_links(update_virtual, config)
+            process_ABEL_output.expand_links(add_virtual, config)
+        with timer.phase("header"):
+            header = process_ABEL_output.render_header(config_metadata, building_guid, building_content)
+        with timer.phase("split_write"):
+            for name, entities, with_links in (("update_reporting", update_reporting, False),
+                                               ("update_virtual", update_virtual, True),
+                                               ("add_virtual", add_virtual, True)):
+                process_ABEL_output.lowercase_update_mask(entities)
+                split = (process_ABEL_output.split_guids_with_links_from_dict if with_links
+                         else process_ABEL_output.split_guids_no_links_from_dict)
+                split(entities, os.path.join(work_dir, f"{name}_entities"), name, config_metadata,
+                      building_guid, building_content, workers=1, header=header)
+        del config, pool, update_reporting, update_virtual, add_virtual
+
+        streaming_dir = os.path.join(work_dir, "streaming")
+        os.makedirs(streaming_dir)
+        streaming_export = shutil.copy(export_path, streaming_dir)
+        with timer.phase("process_file_streaming"):
+            process_ABEL_output.process_file_streaming(streaming_export)
+
+        split_dir = os.path.join(work_dir, "split_large_configs")
+        os.makedirs(split_dir)
+        split_export = shutil.copy(export_path, split_dir)
+        with timer.phase("split_config_file"):
+            split_large_configs.split_config_file(split_export)
+
+        return {
+            "reporting_entities": reporting,
+            "fan_out": fan_out,
+            "export_bytes": os.path.getsize(export_path),
+            "phases": timer.phases,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000], help="reporting entity counts")
+    parser.add_argument("--fan-out", type=int, default=3, help="links per virtual entity")
+    parser.add_argument("--out", default=os.path.join(HERE, "benchmark_results"), help="directory for JSON results")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="skip memory tracking (tracemalloc slows the phases down noticeably)")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "processing",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "libyaml": yaml_io.LIBYAML,
+        "tracemalloc": not args.no_tracemalloc,
+        "runs": [],
+    }
+    for size in args.sizes:
+        run = run_size(size, args.fan_out, not args.no_tracemalloc)
+        report["runs"].append(run)
+        print(f"\n{size} reporting entities ({run['export_bytes'] / 1e6:.1f} MB export)")
+        for name, phase in run["phases"].items():
+            peak = f"{phase['peak_bytes'] / 1e6:9.1f} MB peak" if phase["peak_bytes"] is not None else ""
+            print(f"  {name:<24}{phase['seconds']:>9.2f}s {peak}")
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"processing-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Compare pure-Python and libyaml YAML load/dump on a large synthetic ABEL export.
+
+Usage: python3 benchmark_yaml_io.py [--entities N] [--repeat R]
+"""
+import argparse
+import io
+import time
+import yaml
+import yaml_io
+from generate_synthetic_export import export_text
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def dump(data, dumper):
+    return yaml.dump(data, Dumper=dumper, default_flow_style=False, sort_keys=False, allow_unicode=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=10000, help="number of reporting entities")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    text = export_text(reporting=args.entities)
+    print(f"Synthetic export: {args.entities} reporting entities, {len(text) / 1e6:.1f} MB")
+    py_load, py_data = best_of(args.repeat, lambda: yaml.load(io.StringIO(text), Loader=yaml.SafeLoader))
+    py_dump, py_text = best_of(args.repeat, lambda: dump(py_data, yaml.SafeDumper))
+    if not yaml_io.LIBYAML:
+        print("libyaml is not available; only the pure-Python path was measured.")
+        print(f"{'':6}{'pure-Python':>14}")
+        print(f"{'load':6}{py_load:>13.2f}s")
+        print(f"{'dump':6}{py_dump:>13.2f}s")
+        return
+
+    c_load, c_data = best_of(args.repeat, lambda: yaml_io.load_yaml(io.StringIO(text)))
+    c_dump, c_text = best_of(args.repeat, lambda: dump(c_data, yaml_io.Dumper))
+
+    print(f"{'':6}{'pure-Python':>14}{'libyaml':>12}{'speedup':>10}")
+    print(f"{'load':6}{py_load:>13.2f}s{c_load:>11.2f}s{py_load / c_load:>9.1f}x")
+    print(f"{'dump':6}{py_dump:>13.2f}s{c_dump:>11.2f}s{py_dump / c_dump:>9.1f}x")
+    print("Parsed data identical:", py_data == c_data)
+    print("Dumped text identical:", py_text == c_text)
+
+
+if __name__ == "__main__":
+    main()
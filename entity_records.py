@@ -0,0 +1,175 @@
+"""Compact entity records that keep the raw YAML text of a top-level block.
+
+Splitting only needs a handful of fields from each entity (type, whether it
+has a translation, its links, operation and update_mask), so EntityRecord
+parses just those from the block text and keeps the rest as the original
+bytes. Output is the source text itself, with only the edits splitting
+requires: update_mask lowercased, operation/update_mask dropped from link
+copies, and optionally the etag replaced by the building config's. Blocks
+whose layout the scanner can't vouch for (flow style, anchors, escapes in
+update_mask, ...) are parsed with YAML instead and rendered as before.
+"""
+import re
+import yaml
+import yaml_blocks
+from yaml_io import SingleQuoted, inline_scalar, load_yaml, render_config
+
+# Child keys of an entity block, at the two-space indent the exports use
+_CHILD_KEY = re.compile(rb"^  ([^\s#-][^:\n]*):(?:[ \t]+([^\n]*?))?[ \t]*\r?$", re.M)
+_FIRST_LINE = re.compile(rb"([^\s#'\"?&*!|>%@`{\[-][^:\n]*):[ \t]*\r?\n")
+
+
+def _scalar(value):
+    """An inline scalar that the loader reads as a string, or None."""
+    decoded = inline_scalar(value)
+    return decoded if isinstance(decoded, str) else None
+
+
+class EntityRecord:
+    """One top-level entity: raw block text plus the fields needed to route it.
+
+    raw is None for records that fell back to a full parse; content then holds the entity dict.
+    """
+
+    __slots__ = ("guid", "raw", "content", "type", "has_translation", "links", "operation",
+                 "has_update_mask", "_operation_span", "_update_mask_span", "_etag_span", "_body_start")
+
+    def __init__(self, guid, raw=None, content=None):
+        self.guid = guid
+        self.raw = raw
+        self.content = content
+        self.type = None
+        self.has_translation = False
+        self.links = None
+        self.operation = None
+        self.has_update_mask = False
+        self._operation_span = None
+        self._update_mask_span = None
+        self._etag_span = None
+        self._body_start = None
+
+    @classmethod
+    def from_block(cls, raw):
+        """Build a record from the bytes of one top-level block (as found by yaml_blocks)."""
+        record = cls._scan(raw)
+        if record is not None:
+            return record
+        parsed = load_yaml(raw.decode("utf-8"))
+        if not isinstance(parsed, dict) or len(parsed) != 1:
+            raise ValueError("Block is not a single top-level entry")
+        guid, content = next(iter(parsed.items()))
+        return cls.from_content(guid, content)
+
+    @classmethod
+    def from_content(cls, guid, content):
+        record = cls(guid, content=content)
+        if isinstance(content, dict):
+            record.type = content.get("type")
+            record.has_translation = "translation" in content
+            record.links = tuple(content["links"]) if "links" in content else None
+            record.operation = content.get("operation")
+            record.has_update_mask = "update_mask" in content
+        return record
+
+    @classmethod
+    def _scan(cls, raw):
+        first = _FIRST_LINE.match(raw)
+        if first is None:
+            return None
+        guid = _scalar(first.group(1).rstrip())
+        if guid is None:
+            return None
+        body_end = len(raw.rstrip()) + 1
+        if raw.endswith(b"\n"):
+            raw_end = len(raw)
+        else:
+            raw += b"\n"
+            raw_end = len(raw)
+
+        record = cls(guid, raw=raw)
+        record._body_start = first.end()
+        children = [(m.group(1), m.group(2), m.start()) for m in _CHILD_KEY.finditer(raw, first.end())]
+        if not children or children[0][2] != first.end():
+            return None
+        for i, (key, value, start) in enumerate(children):
+            end = children[i + 1][2] if i + 1 < len(children) else min(body_end, raw_end)
+            if key == b"type":
+                record.type = _scalar(value)
+                if record.type is None:
+                    return None
+            elif key == b"translation":
+                record.has_translation = True
+            elif key == b"links":
+                links = load_yaml(raw[start:end].decode("utf-8"))["links"]
+                if not isinstance(links, dict):
+                    return None
+                record.links = tuple(links)
+            elif key == b"operation":
+                record.operation = _scalar(value)
+                if record.operation is None:
+                    return None
+                record._operation_span = (start, end)
+            elif key == b"update_mask":
+                span = raw[start:end]
+                if b"\\" in span or b"&" in span or b"*" in span:
+                    return None
+                record.has_update_mask = True
+                record._update_mask_span = (start, end)
+            elif key == b"etag":
+                record._etag_span = (start, end)
+        return record
+
+    def render(self, link_copy=False, etag=None):
+        """Bytes for this entity in an output file; link copies lose operation and update_mask.
+
+        A non-None etag replaces the entity's etag (or is added), as transfer_etags.sync_etags would.
+        """
+        if self.raw is None:
+            content = self.content
+            if link_copy:
+                content = {k: v for k, v in content.items() if k not in ("operation", "update_mask")}
+            elif isinstance(content, dict) and "update_mask" in content:
+                content = dict(content, update_mask=[x.lower() for x in content["update_mask"]])
+            if etag is not None and isinstance(content, dict):
+                content = dict(content, etag=SingleQuoted(etag))
+            return render_config({self.guid: content}).encode("utf-8")
+
+        edits = []
+        if link_copy:
+            edits = [(span, b"") for span in (self._operation_span, self._update_mask_span) if span]
+        elif self._update_mask_span:
+            start, end = self._update_mask_span
+            edits = [(self._update_mask_span, self.raw[start:end].lower())]
+        if etag is not None:
+            line = b"  etag: '" + etag.replace("'", "''").encode("utf-8") + b"'\n"
+            edits.append((self._etag_span or (self._body_start, self._body_start), line))
+        if not edits:
+            return self.raw
+        parts = []
+        position = 0
+        for (start, end), replacement in sorted(edits):
+            parts.append(self.raw[position:start])
+            parts.append(replacement)
+            position = end
+        parts.append(self.raw[position:])
+        return b"".join(parts)
+
+
+def read_records(path):
+    """EntityRecords for every top-level block of a config file, in file order."""
+    with open(path, "rb") as f:
+        return [EntityRecord.from_block(yaml_blocks.read_raw(f, offset, length))
+                for offset, length in list(yaml_blocks.iter_top_level_blocks(f))]
+
+
+def entity_guids(path):
+    """GUIDs a config file onboards: every entity except CONFIG_METADATA and the building.
+
+    Returns [] for a file that can't be read or parsed.
+    """
+    try:
+        records = read_records(path)
+    except (OSError, ValueError, yaml.YAMLError):
+        return []
+    return [record.guid for record in records
+            if record.guid != "CONFIG_METADATA" and record.type != "FACILITIES/BUILDING"]
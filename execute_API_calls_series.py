@@ -1,16 +1,44 @@
-import subprocess
+import collections
 import re
 import os
 import time
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import transfer_etags
+import batch_packing
+import entity_records
 import export_building_config  # import our new export logic
+import export_cache
+import rate_limiter
+import onboard_retry
+import onboard_scheduler
+import operation_poller
+import stubby_transport
+import output_manifest
+import preflight
+import run_state
+import telemetry
+import profiling
+
+# OnboardBuilding operations can legitimately run for a long time; give up after 6 hours
+ONBOARD_POLL_POLICY = operation_poller.PollPolicy(initial_delay=10, min_delay=10, max_delay=60,
+                                                  deadline=6 * 60 * 60)
+# Deferred retries of timed-out, stale-etag and transient failures, after the main pass
+RETRY_POLICY = onboard_retry.RetryPolicy(max_retries=2, base_delay=60, max_delay=600)
 
 
 # ----------------------------
 # Helper functions
 # ----------------------------
-def run_onboard_and_get_status(building_code, topology_file_path, result_file_path):
+def run_onboard_and_get_status(building_code, topology_file_path, result_file_path, limiter=None,
+                               operation_name=None, on_operation=None):
+    """Onboard one config file and poll until its operation finishes; returns True on success.
+
+    Pass operation_name to resume polling an operation submitted by an earlier run instead of
+    submitting the file again. on_operation(operation_name) is called once the name is known.
+    """
+    label = os.path.basename(topology_file_path)
     try:
         _, city_code, building_code_part = building_code.split("-", 2)
     except ValueError:
@@ -34,24 +62,31 @@ def run_onboard_and_get_status(building_code, topology_file_path, result_file_pa
         "--set_field",
         f"topology_file=readfile({topology_file_path})"
     ]
-    print("Running onboarding command...")
-    onboard_result = subprocess.run(onboard_args, capture_output=True, text=True)
-    if onboard_result.returncode != 0:
-        print("OnboardBuilding failed (return code != 0):")
-        print(onboard_result.stderr.strip())
-        if onboard_result.stdout:
-            print("Onboard stdout:\n", onboard_result.stdout)
-        print("\a")
-        return False
+    if operation_name is None:
+        print(f"[{label}] Running onboarding command...")
+        rate_limiter.acquire(limiter)
+        onboard_result = stubby_transport.run_stubby(onboard_args)
+        if onboard_result.returncode != 0:
+            print(f"[{label}] OnboardBuilding failed (return code != 0):")
+            print(onboard_result.stderr.strip())
+            if onboard_result.stdout:
+                print("Onboard stdout:\n", onboard_result.stdout)
+            print("\a")
+            return False
 
-    onboard_combined = (onboard_result.stdout or "") + "\n" + (onboard_result.stderr or "")
-    match = re.search(r'name:\s*["\']([^"\']+)["\']', onboard_combined)
-    if not match:
-        print("Failed to extract operation name from OnboardBuilding output")
-        print("\a")
-        return False
+        onboard_combined = (onboard_result.stdout or "") + "\n" + (onboard_result.stderr or "")
+        match = re.search(r'name:\s*["\']([^"\']+)["\']', onboard_combined)
+        if not match:
+            print(f"[{label}] Failed to extract operation name from OnboardBuilding output")
+            print("\a")
+            return False
+
+        operation_name = match.group(1)
+    else:
+        print(f"[{label}] Resuming operation {operation_name} from a previous run...")
 
-    operation_name = match.group(1)
+    if on_operation is not None:
+        on_operation(operation_name)
 
     get_op_args = [
         "stubby",
@@ -65,11 +100,10 @@ def run_onboard_and_get_status(building_code, topology_file_path, result_file_pa
         f"name: 'projects/digitalbuildings/countries/us/cities/{city_code}/buildings/{building_code_part}', profile:'projects/digitalbuildings/profiles/MaintenanceOps', operation_name: '{operation_name}'"
     ]
 
-    time.sleep(10)
-    check_count = 1
-    while True:
-        print(f"Checking operation status (attempt {check_count})...")
-        get_op_result = subprocess.run(get_op_args, capture_output=True, text=True)
+    def check_operation(check_count):
+        print(f"[{label}] Checking operation status (attempt {check_count})...")
+        rate_limiter.acquire(limiter)
+        get_op_result = stubby_transport.run_stubby(get_op_args)
 
         file_content = ""
         try:
@@ -83,27 +117,27 @@ def run_onboard_and_get_status(building_code, topology_file_path, result_file_pa
         combined_out = combined_out.strip()
 
         if get_op_result.returncode != 0:
-            print("Warning: GetOperation returned non-zero exit code:", get_op_result.returncode)
+            print(f"[{label}] Warning: GetOperation returned non-zero exit code:", get_op_result.returncode)
             if get_op_result.stderr:
                 print("GetOperation stderr:\n", get_op_result.stderr.strip())
 
         if re.search(r"\brunning\b", combined_out, re.I):
-            if check_count <= 3:
-                wait_time = 10
-            elif check_count <= 6:
-                wait_time = 30
-            else:
-                wait_time = 60
-            print(f"Operation still running — will retry in {wait_time} seconds")
-            time.sleep(wait_time)
-            check_count += 1
-            continue
-
-        print(f"Operation appears finished. Check results folder for operation status.")
-        if "Successfully completed onboard operation." not in combined_out:
-            print("\a")
-            return False
-        return True
+            print(f"[{label}] Operation still running")
+            return None
+        return combined_out
+
+    try:
+        combined_out = operation_poller.wait_for_operation(operation_name, check_operation, ONBOARD_POLL_POLICY)
+    except operation_poller.OperationTimeout as e:
+        print(f"[{label}] {e}; giving up on this file.")
+        print("\a")
+        return False
+
+    print(f"[{label}] Operation appears finished. Check results folder for operation status.")
+    if "Successfully completed onboard operation." not in combined_out:
+        print("\a")
+        return False
+    return True
 
 
 def build_result_path(cfg_path):
@@ -117,27 +151,242 @@ def build_result_path(cfg_path):
     return os.path.join(result_dir, f"{base}_result{ext}")
 
 
-def analyze_results(result_files):
+def read_result_text(result_file):
+    try:
+        with open(result_file, "r", encoding="utf-8", errors="ignore") as fh:
+            return fh.read().strip()
+    except OSError:
+        return ""
+
+
+def onboard_config_files(building_code, config_files, building_config_path, max_workers=1, limiter=None,
+                         retry_policy=None, breaker=None, joined_etags=None, content_hashes=None,
+                         preflight_workers=None):
+    """Onboard config files with up to max_workers in flight; returns result_files in input order.
+
+    Files that fail in a retryable way (see onboard_retry) are retried after the pass under
+    retry_policy (default RETRY_POLICY). New submissions wait while breaker is open.
+
+    config_files may also be a generator (see pipeline.py): each file is then checked and
+    submitted as soon as it is produced. joined_etags maps a config path to the {guid: etag}
+    already written into it; such files skip sync_etags unless one of those etags has since
+    changed. content_hashes gives the content hash of files that aren't in a manifest.
+    A list of files is pre-flight checked in up to preflight_workers processes (default: one per CPU).
+    """
+    retry_policy = retry_policy or RETRY_POLICY
+    breaker = breaker or onboard_retry.CircuitBreaker()
+    result_files = []
+
+    def prepare(cfg):
+        """Add cfg to result_files; returns its pending entry, or None if it was already onboarded."""
+        i = len(result_files)
+        result_file = build_result_path(cfg)
+        store = run_state.open_store(os.path.dirname(os.path.dirname(result_file)))
+        # Files from process_ABEL_output are tracked by content hash, anything else by path
+        content_hash = (content_hashes or {}).get(cfg) or output_manifest.lookup_content_hash(cfg)
+        if store.is_completed(cfg, content_hash):
+            print(f"✅ Skipping {cfg} — already successfully onboarded.")
+            result_files.append((result_file, cfg, True))
+            return None
+        result_files.append((result_file, cfg, False))
+        return (i, cfg, result_file, store, content_hash)
+
+    if isinstance(config_files, (list, tuple)):
+        pending = [entry for entry in map(prepare, config_files) if entry]
+        if not pending:
+            return result_files
+
+        code_error = preflight.check_building_code(building_code)
+        if code_error:
+            print(f"❌ {code_error}")
+            return result_files
+
+        # Build (or load) the etag index once up front rather than racing to build it in every worker
+        transfer_etags.load_etag_index(building_config_path)
+
+        # Reject files that can't succeed before they take a round trip; operations already
+        # submitted by an earlier run are left to finish
+        to_check = [cfg for i, cfg, result_file, store, content_hash in pending
+                    if store.resumable_operation(cfg, content_hash) is None]
+        rejected = preflight.run_preflight(to_check, building_config_path,
+                                           workers=preflight_workers or os.cpu_count() or 1)
+        if rejected:
+            pending = [entry for entry in pending if entry[1] not in rejected]
+            if not pending:
+                return result_files
+    else:
+        code_error = preflight.check_building_code(building_code)
+        if code_error:
+            print(f"❌ {code_error}")
+            return result_files
+        transfer_etags.load_etag_index(building_config_path)
+
+        def checked(cfgs):
+            for entry in map(prepare, cfgs):
+                if entry is None:
+                    continue
+                i, cfg, result_file, store, content_hash = entry
+                if (store.resumable_operation(cfg, content_hash) is not None
+                        or preflight.preflight_file(cfg, transfer_etags.load_etag_index(building_config_path))):
+                    yield entry
+
+        pending = checked(config_files)
+
+    progress_lock = threading.Lock()
+    progress = {"done": 0, "total": 0}
+    refresh_lock = threading.Lock()
+
+    def sync_fresh_etags(cfg):
+        """sync_etags, re-exporting the building first if cfg needs etags changed by earlier onboards."""
+        joined = joined_etags.get(cfg) if joined_etags else None
+        if joined is not None:
+            current = transfer_etags.load_etag_index(building_config_path)
+            if (all(current.get(guid) == etag for guid, etag in joined.items())
+                    and not transfer_etags.stale_guids(building_config_path, joined)):
+                return
+        stale = transfer_etags.sync_etags(building_config_path, cfg)
+        if not stale:
+            return
+        with refresh_lock:
+            # Another worker may have re-exported while this one waited
+            if transfer_etags.stale_guids(building_config_path, stale):
+                print(f"{len(stale)} etag(s) in {os.path.basename(cfg)} changed since the export; re-exporting building...")
+                export_cache.refresh(building_code, building_config_path)
+        if transfer_etags.sync_etags(building_config_path, cfg):
+            print(f"⚠️ Warning: onboarding {os.path.basename(cfg)} with possibly stale etags")
+
+    def onboard_one(cfg, result_file, store, content_hash):
+        """Onboard one file; returns None on success, else the onboard_retry failure kind."""
+        print(f"\n--- Processing config file: {cfg} ---")
+        with telemetry.span("onboard_file", file=cfg, bytes=os.path.getsize(cfg)) as record:
+            resume_operation = store.resumable_operation(cfg, content_hash)
+            if resume_operation is None:
+                breaker.wait()
+                sync_fresh_etags(cfg)
+                store.mark_started(cfg, content_hash)
+            record["attempt"] = (store.get(cfg) or {}).get("attempts")
+            record["resumed"] = resume_operation is not None
+            submitted = []
+
+            def on_operation(name):
+                submitted.append(name)
+                store.set_operation(cfg, name)
+
+            success = run_onboard_and_get_status(building_code, cfg, result_file, limiter,
+                                                 operation_name=resume_operation, on_operation=on_operation)
+            result_text = read_result_text(result_file)
+            failure = None if success else onboard_retry.classify_failure(result_text, bool(submitted))
+            store.mark_finished(cfg, success, error=None if success else f"{failure}: {result_text[-500:]}")
+            if failure == onboard_retry.TIMEOUT:
+                # Remembered so the next packing run can shrink its budget below this file's size
+                store.record_timeout(cfg, *batch_packing.config_shape(cfg))
+            breaker.record(failure)
+            if success:
+                # These entities now have new etags; later files that link to them must not reuse the old ones
+                transfer_etags.record_onboarded_etags(building_config_path, entity_records.entity_guids(cfg),
+                                                      result_text)
+            record["outcome"] = "succeeded" if success else failure
+        with progress_lock:
+            progress["done"] += 1
+            status = "succeeded" if success else f"failed ({failure})"
+            print(f"[{progress['done']}/{progress['total']}] {os.path.basename(cfg)} {status}")
+        return failure
+
+    def run_pass(entries):
+        """Onboard entries in parallel, files sharing entities one after another (see onboard_scheduler).
+
+        Returns the entries that failed in a retryable way.
+        """
+        retry = []
+        progress.update(done=0, total=0)
+        if isinstance(entries, list):
+            entries = sorted(entries, key=lambda entry: onboard_scheduler.schedule_key(entry[1]))
+        added = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            scheduler = onboard_scheduler.DependencyScheduler(executor, onboard_one)
+            # entries may be a generator; each file starts as soon as it is produced and its
+            # prerequisites have finished
+            for entry in entries:
+                with progress_lock:
+                    progress["total"] += 1
+                added.append(entry)
+                scheduler.add(entry[1], entity_records.entity_guids(entry[1]), *entry[1:])
+            finished = scheduler.wait()
+        if scheduler.held:
+            print(f"{scheduler.held} of {len(added)} file(s) waited for earlier files with the same entities "
+                  f"(longest chain: {max(scheduler.depth.values())})")
+        for entry in added:
+            i, cfg, result_file, store, content_hash = entry
+            try:
+                failure = finished[cfg].result()
+            except Exception as e:
+                print(f"ERROR: onboarding {cfg} raised {e!r}")
+                store.mark_finished(cfg, False, error=repr(e))
+                failure = None
+            if failure in onboard_retry.RETRYABLE:
+                retry.append((entry, failure))
+        return retry
+
+    retry = run_pass(pending)
+    for retry_round in range(1, retry_policy.max_retries + 1):
+        if not retry:
+            break
+        delay = retry_policy.delay(retry_round)
+        kinds = collections.Counter(failure for _, failure in retry)
+        print(f"\nRetrying {len(retry)} failed file(s) in {delay:.0f}s (round {retry_round}/{retry_policy.max_retries}: "
+              + ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items())) + ")")
+        time.sleep(delay)
+        if kinds[onboard_retry.STALE_ETAG]:
+            print("Re-exporting building for files rejected with stale etags...")
+            export_cache.refresh(building_code, building_config_path)
+        retry = run_pass([entry for entry, _ in retry])
+    if retry:
+        print(f"⚠️ {len(retry)} file(s) still failing after {retry_policy.max_retries} retry round(s)")
+
+    return result_files
+
+
+def print_time_breakdown():
+    """Print where time went in this run, per telemetry span (nested spans overlap their parents)."""
+    totals = telemetry.summary()
+    if not totals:
+        return
+    print("\nTime breakdown (summed across parallel workers):")
+    for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        print(f"  {name:<28} {total:9.1f}s over {count} call(s)")
+
+
+def summarize_results(result_files):
+    """Tally onboarding outcomes from the run-state store.
+
+    Returns (success_count, failed_files, latencies) where failed_files are basenames and
+    latencies are the start-to-finish seconds of files onboarded (not skipped) in this run.
+    """
     success_count = 0
-    fail_count = 0
     failed_files = []
 
-    for res_file, orig_cfg, was_skipped in result_files:
-        if was_skipped:
-            success_count += 1
-            continue
-        content = ""
-        try:
-            with open(res_file, "r", encoding="utf-8", errors="ignore") as fh:
-                content = fh.read()
-        except Exception as e:
-            print(f"Warning: couldn't read {res_file}: {e}")
+    rows = {}
+    by_root = {}
+    for res_file, orig_cfg, _ in result_files:
+        by_root.setdefault(os.path.dirname(os.path.dirname(res_file)), []).append(orig_cfg)
+    for results_root, cfgs in by_root.items():
+        rows.update(run_state.open_store(results_root).statuses(cfgs))
 
-        if "Successfully completed onboard operation." in content:
+    latencies = []
+    for res_file, orig_cfg, was_skipped in result_files:
+        row = rows.get(os.path.abspath(orig_cfg))
+        if not was_skipped and row and row["started_at"] and row["finished_at"]:
+            latencies.append(row["finished_at"] - row["started_at"])
+        if was_skipped or (row and row["status"] == run_state.SUCCEEDED):
             success_count += 1
         else:
-            fail_count += 1
             failed_files.append(os.path.basename(orig_cfg))
+    return success_count, failed_files, latencies
+
+
+def analyze_results(result_files):
+    success_count, failed_files, latencies = summarize_results(result_files)
+    fail_count = len(failed_files)
 
     print("\n===== SUMMARY =====")
     print(f"✅ Successful onboardings: {success_count}")
@@ -146,6 +395,11 @@ def analyze_results(result_files):
         print("\nFailed config files:")
         for f in failed_files:
             print(f"  - {f}")
+    if latencies:
+        print("\nPer-file onboarding latency: " + ", ".join(
+            f"p{int(q * 100)} {telemetry.percentile(latencies, q):.1f}s" for q in (0.5, 0.9, 0.99))
+              + f", max {max(latencies):.1f}s")
+    print_time_breakdown()
     # Final chime for script completion
     for _ in range(3):
         print("\a", end="", flush=True)
@@ -156,6 +410,7 @@ def analyze_results(result_files):
 # Main script
 # ----------------------------
 if __name__ == "__main__":
+    profiling.install("execute_API_calls_series")
     building_code = input("Enter building code (format US-XXX-YYY): ").strip()
 
     print("\nChoose input mode:")
@@ -200,39 +455,30 @@ if __name__ == "__main__":
             print(f"ERROR: File not found: {building_config_path}")
             sys.exit(1)
     if export_building_config_prompt.lower() == 'y':
-        building_config_path = input("\nEnter absolute path for the new building config.yaml: ").strip()
-        print("\n=== Exporting new building config ===")
-        try:
-            export_building_config.export_building_config(building_code, building_config_path)
-        except SystemExit:
-            print("⚠️ Warning: Failed to update building config. Continuing with existing file...")
+        building_config_path = input("\nEnter absolute path for the new building config.yaml "
+                                     "(blank to use the cached export for this building): ").strip()
+        if not building_config_path:
+            building_config_path = export_cache.get_building_config(building_code)
+            if building_config_path is None:
+                sys.exit(1)
+        else:
+            print("\n=== Exporting new building config ===")
+            try:
+                exported = export_building_config.export_building_config(building_code, building_config_path)
+            except SystemExit:
+                exported = False
+            if not exported:
+                print("⚠️ Warning: Failed to update building config. Continuing with existing file...")
+
+    max_workers_input = input("How many files should be onboarded in parallel? [1]: ").strip()
+    max_workers = int(max_workers_input) if max_workers_input else 1
+    rate_input = input("Maximum stubby calls per second (blank for unlimited): ").strip()
+    limiter = rate_limiter.TokenBucket(float(rate_input)) if rate_input else None
 
     # ----------------------------------
     # Onboard each entity config
     # ----------------------------------
-    result_files = []
-    for cfg in config_files:
-        result_file = build_result_path(cfg)
-
-        skip_file = False
-        if os.path.exists(result_file):
-            try:
-                with open(result_file, "r", encoding="utf-8", errors="ignore") as fh:
-                    content = fh.read()
-                if "Successfully completed onboard operation." in content:
-                    print(f"✅ Skipping {cfg} — already successfully onboarded.")
-                    skip_file = True
-            except Exception as e:
-                print(f"Warning: couldn't read {result_file}: {e}")
-
-        if skip_file:
-            result_files.append((result_file, cfg, True))
-            continue
-
-        print(f"\n--- Processing config file: {cfg} ---")
-        transfer_etags.sync_etags(building_config_path, cfg)
-        success = run_onboard_and_get_status(building_code, cfg, result_file)
-        result_files.append((result_file, cfg, False))
-        print(f"Moving to next file...")
+    result_files = onboard_config_files(building_code, config_files, building_config_path,
+                                        max_workers=max_workers, limiter=limiter)
 
-    analyze_results(result_files)
\ No newline at end of file
+    analyze_results(result_files)
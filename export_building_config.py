@@ -1,11 +1,30 @@
-import subprocess
 import re
 import os
+import mmap
 import sys
-import time
+import transfer_etags
+import operation_poller
+import stubby_transport
+import telemetry
+import profiling
+
+# Exports normally finish within a minute or two; stop polling after 10 minutes
+EXPORT_POLL_POLICY = operation_poller.PollPolicy(initial_delay=10, min_delay=10, max_delay=30,
+                                                 deadline=10 * 60)
 
 def export_building_config(building_code, outfile_path):
-    """Run ExportBuildingConfig, poll until result is written to outfile, then clean gibberish."""
+    """Run ExportBuildingConfig, poll until result is written to outfile, then clean gibberish.
+
+    Returns False if the exported file didn't contain a building config.
+    """
+    with telemetry.span("export_building_config", building=building_code, file=outfile_path) as record:
+        cleaned = _export_building_config(building_code, outfile_path)
+        record["bytes"] = os.path.getsize(outfile_path)
+        record["outcome"] = "ok" if cleaned else "failed"
+    return cleaned
+
+
+def _export_building_config(building_code, outfile_path):
 
     # ----------------------------
     # Parse building code
@@ -37,7 +56,7 @@ def export_building_config(building_code, outfile_path):
     ]
 
     print("Running export building config command...")
-    export_result = subprocess.run(export_args, capture_output=True, text=True)
+    export_result = stubby_transport.run_stubby(export_args)
 
     if export_result.returncode != 0:
         print("❌ ExportBuildingConfig failed (return code != 0):")
@@ -73,11 +92,9 @@ def export_building_config(building_code, outfile_path):
         f"name: 'projects/digitalbuildings/countries/us/cities/{city_code}/buildings/{building_code_part}', profile:'projects/digitalbuildings/profiles/MaintenanceOps', operation_name: '{operation_name}'"
     ]
 
-    time.sleep(10)
-
-    for attempt in range(1, 4):  # 3 tries max
+    def check_operation(attempt):
         print(f"Checking operation status (attempt {attempt})...")
-        get_op_result = subprocess.run(get_op_args, capture_output=True, text=True)
+        get_op_result = stubby_transport.run_stubby(get_op_args)
 
         if get_op_result.returncode != 0:
             print(f"⚠️ GetOperation failed with exit code {get_op_result.returncode}")
@@ -91,47 +108,76 @@ def export_building_config(building_code, outfile_path):
                     content = fh.read()
                 if content.strip():
                     if "running" in content.lower():
-                        print("Operation still running — retrying in 10 seconds...")
+                        print("Operation still running...")
                     else:
-                        #print(f"✅ Export appears successful. Config written to: {outfile_path}")
-                        clean_export_file(outfile_path)
                         return True
             except Exception as e:
                 print(f"Warning: couldn't read outfile {outfile_path}: {e}")
+        return None
 
-        if attempt < 3:
-            time.sleep(10)
+    try:
+        operation_poller.wait_for_operation(operation_name, check_operation, EXPORT_POLL_POLICY)
+    except operation_poller.OperationTimeout:
+        print(f"❌ Export did not complete successfully (still running after {EXPORT_POLL_POLICY.deadline} seconds).")
+        sys.exit(1)
 
-    print("❌ Export did not complete successfully (still running after 3 attempts).")
-    sys.exit(1)
+    #print(f"✅ Export appears successful. Config written to: {outfile_path}")
+    return clean_export_file(outfile_path)
 
 
 def clean_export_file(outfile_path):
-    """Remove gibberish characters before CONFIG_METADATA: in the exported file."""
+    """Remove gibberish characters before CONFIG_METADATA: in the exported file, in place.
+
+    The file is memory-mapped and its tail shifted down over the binary prefix, so the config
+    is never copied into Python memory. The etag index is built from the same mapping.
+    """
+    marker = b"CONFIG_METADATA:"
     try:
-        with open(outfile_path, "r", encoding="utf-8", errors="ignore") as fh:
-            content = fh.read()
+        with open(outfile_path, "r+b") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size == 0:
+                print("⚠️ Warning: CONFIG_METADATA not found in file. Leaving file unchanged.")
+                return False
+            with mmap.mmap(fh.fileno(), 0) as mm:
+                idx = mm.find(marker)
+                if idx == -1:
+                    print("⚠️ Warning: CONFIG_METADATA not found in file. Leaving file unchanged.")
+                    return False
+                cleaned_size = size - idx
+                if idx:
+                    mm.move(0, idx, cleaned_size)
+                    mm.flush()
+                with memoryview(mm) as view:
+                    etags = transfer_etags.scan_etags(view[:cleaned_size])
+            fh.truncate(cleaned_size)
 
-        marker = "CONFIG_METADATA:"
-        idx = content.find(marker)
-        if idx == -1:
-            print("⚠️ Warning: CONFIG_METADATA not found in file. Leaving file unchanged.")
-            return
+        print("✅ Building config successfully refreshed")
+    except Exception as e:
+        print(f"⚠️ Failed to clean file {outfile_path}: {e}")
+        return False
 
-        cleaned_content = content[idx:]
-        with open(outfile_path, "w", encoding="utf-8") as fh:
-            fh.write(cleaned_content)
+    if etags is None:
+        refresh_etag_index(outfile_path)
+    else:
+        transfer_etags.store_etag_index(outfile_path, etags)
+        print(f"✅ Etag index rebuilt ({len(etags)} entities)")
+    return True
 
-        print("✅ Building config successfully refreshed")
 
+def refresh_etag_index(outfile_path):
+    """Rebuild the persisted GUID -> etag index for a freshly exported building config."""
+    try:
+        etags = transfer_etags.build_etag_index(outfile_path)
+        print(f"✅ Etag index rebuilt ({len(etags)} entities)")
     except Exception as e:
-        print(f"⚠️ Failed to clean file {outfile_path}: {e}")
+        print(f"⚠️ Failed to build etag index for {outfile_path}: {e}")
 
 
 # ----------------------------
 # Main
 # ----------------------------
 if __name__ == "__main__":
+    profiling.install("export_building_config")
     building_code = input("Enter building code (format US-XXX-YYY): ").strip()
     outfile_path = input("Enter absolute path for output full_building_config.yaml: ").strip()
 
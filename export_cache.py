@@ -0,0 +1,75 @@
+"""Cached building config exports, keyed by building code.
+
+A full ExportBuildingConfig can take minutes, so the most recent export of each
+building is kept in a cache directory (ABEL_EXPORT_CACHE, default
+~/.abel_export_cache) and reused while it is younger than EXPORT_TTL. During an
+onboarding run the etags of onboarded entities are tracked incrementally (see
+transfer_etags.record_onboarded_etags); the building is only exported again when
+the cached file is missing, expired, or a config file needs an etag that is known
+to be stale.
+"""
+import os
+import time
+import export_building_config
+import transfer_etags
+
+CACHE_DIR_ENV = "ABEL_EXPORT_CACHE"
+EXPORT_TTL = 4 * 60 * 60
+
+
+def cache_dir():
+    return os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.expanduser("~"), ".abel_export_cache")
+
+
+def cache_path(building_code):
+    return os.path.join(cache_dir(), f"{building_code.upper()}_building_config.yaml")
+
+
+def export_age(path):
+    """Seconds since path was exported, or None if it doesn't exist."""
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def is_fresh(path, ttl=EXPORT_TTL):
+    age = export_age(path)
+    return age is not None and age < ttl
+
+
+def refresh(building_code, outfile_path):
+    """Export the building into outfile_path, replacing it only once the new export is complete.
+
+    Returns False (leaving any existing file in place) if the export failed.
+    """
+    tmp_path = outfile_path + ".exporting"
+    try:
+        exported = export_building_config.export_building_config(building_code, tmp_path)
+    except SystemExit:
+        exported = False
+    # Indexed while the export was cleaned; carried over so the new config isn't parsed again
+    etags = dict(transfer_etags.load_etag_index(tmp_path)) if exported else None
+    tmp_index = transfer_etags.etag_index_path(tmp_path)
+    if os.path.exists(tmp_index):
+        os.remove(tmp_index)
+    if not exported:
+        print(f"⚠️ Warning: export of {building_code} failed; keeping the existing building config.")
+        return False
+    os.replace(tmp_path, outfile_path)
+    transfer_etags.store_etag_index(outfile_path, etags)
+    return True
+
+
+def get_building_config(building_code, ttl=EXPORT_TTL):
+    """Path of a building config for building_code that is at most ttl seconds old, exporting if needed."""
+    path = cache_path(building_code)
+    age = export_age(path)
+    if age is not None and age < ttl:
+        print(f"✅ Using cached export of {building_code} ({age / 60:.0f} minutes old): {path}")
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not refresh(building_code, path) and age is None:
+        print(f"❌ No building config available for {building_code}.")
+        return None
+    return path
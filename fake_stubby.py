@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Local stand-in for the `stubby` CLI, for measuring the onboarding pipeline offline.
+
+Implements the three RPCs the scripts use: OnboardBuilding, ExportBuildingConfig
+and GetOperation. Point the scripts at it with
+    ABEL_STUBBY="python3 /path/to/fake_stubby.py"
+
+Operation state is kept as small JSON files in FAKE_STUBBY_STATE (a directory,
+default: <tmp>/fake_stubby_state) so separate processes see the same operations.
+Behaviour is configured through FAKE_STUBBY_CONFIG, either inline JSON or a
+path to a JSON file, with these keys (all optional):
+    call_latency     [mean, stddev] seconds per CLI call            (default [0.05, 0.02])
+    running_seconds  [min, max] seconds an operation stays running  (default [1, 3])
+    timeout_rate     fraction of onboard operations that end in DEADLINE_EXCEEDED
+    failure_rate     fraction of onboard operations that end in a validation error
+    stale_etag_rate  fraction of onboard operations rejected with an etag mismatch (ABORTED)
+    export_source    building config to serve from ExportBuildingConfig
+    report_etags     if true, successful onboard results list the new etag of every
+                     entity in the topology file (entities { guid: "..." etag: "..." })
+    check_etags      if true (with report_etags), an onboard that completes after another
+                     operation has replaced the etag of one of its entities fails with
+                     ABORTED, like the real service's etag check
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+DEFAULT_CONFIG = {
+    "call_latency": [0.05, 0.02],
+    "running_seconds": [1.0, 3.0],
+    "timeout_rate": 0.0,
+    "failure_rate": 0.0,
+    "stale_etag_rate": 0.0,
+    "export_source": None,
+    "report_etags": False,
+    "check_etags": False,
+}
+
+# Real GetOperation --binary_output files start with protobuf framing before the text payload
+BINARY_PREFIX = b"\n\x8a\x01\x12\x1f\x08\x02"
+
+
+def load_config():
+    config = dict(DEFAULT_CONFIG)
+    raw = os.environ.get("FAKE_STUBBY_CONFIG", "").strip()
+    if raw:
+        if not raw.startswith("{"):
+            with open(raw, "r") as f:
+                raw = f.read()
+        config.update(json.loads(raw))
+    return config
+
+
+def state_dir():
+    path = os.environ.get("FAKE_STUBBY_STATE", os.path.join(tempfile.gettempdir(), "fake_stubby_state"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def parse_args(argv):
+    """Split stubby-style argv into (method, flags, request text)."""
+    if len(argv) < 3 or argv[0] != "call":
+        raise SystemExit("usage: fake_stubby.py call <target> <method> [flags] <request>")
+    method = argv[2].rsplit(".", 1)[-1]
+    flags = {}
+    request = ""
+    rest = argv[3:]
+    i = 0
+    while i < len(rest):
+        arg = rest[i]
+        if arg == "--set_field":
+            key, _, value = rest[i + 1].partition("=")
+            flags[key] = value
+            i += 2
+            continue
+        if arg.startswith("--"):
+            key, _, value = arg[2:].partition("=")
+            flags[key] = value or True
+        else:
+            request = arg
+        i += 1
+    return method, flags, request
+
+
+def simulate_latency(config):
+    mean, stddev = config["call_latency"]
+    time.sleep(max(0.0, random.gauss(mean, stddev)))
+
+
+def topology_guids(path):
+    """Top-level keys of a config file, except CONFIG_METADATA."""
+    guids = []
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if line[:1] not in ("", " ", "\n", "#", "-") and ":" in line:
+                key = line.split(":", 1)[0].strip().strip("'\"")
+                if key != "CONFIG_METADATA":
+                    guids.append(key)
+    return guids
+
+
+def topology_etags(path):
+    """GUID -> etag sent (None if none) for every entity of a config file but CONFIG_METADATA and the building."""
+    etags = {}
+    buildings = set()
+    guid = None
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if line[:1] not in ("", " ", "\n", "#", "-") and ":" in line:
+                guid = line.split(":", 1)[0].strip().strip("'\"")
+                etags[guid] = None
+            elif guid and line.startswith("  etag:"):
+                etags[guid] = line.split(":", 1)[1].strip().strip("'\"")
+            elif guid and line.startswith("  type:") and line.split(":", 1)[1].strip() == "FACILITIES/BUILDING":
+                buildings.add(guid)
+    return {guid: etag for guid, etag in etags.items() if guid != "CONFIG_METADATA" and guid not in buildings}
+
+
+def current_etag_path(guid):
+    path = os.path.join(state_dir(), "etags")
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, guid.replace("/", "_"))
+
+
+def resolve_onboard(record, config):
+    """Decide a finished onboard's final outcome once, applying the etag check and issuing new etags."""
+    if record["outcome"] == "success" and config.get("check_etags"):
+        for guid, sent in record.get("sent_etags", {}).items():
+            try:
+                with open(current_etag_path(guid)) as f:
+                    current = f.read()
+            except FileNotFoundError:
+                continue
+            if sent != current:
+                record["outcome"] = "stale_etag"
+                break
+    if record["outcome"] == "success" and config.get("report_etags"):
+        record["new_etags"] = {guid: uuid.uuid4().hex[:16] for guid in record.get("guids", ())}
+        if config.get("check_etags"):
+            for guid in record.get("sent_etags", {}):
+                with open(current_etag_path(guid), "w") as f:
+                    f.write(record["new_etags"][guid])
+    record["resolved"] = True
+
+
+def start_operation(kind, config, guids=(), sent_etags=None):
+    low, high = config["running_seconds"]
+    roll = random.random()
+    if kind == "onboard" and roll < config["timeout_rate"]:
+        outcome = "timeout"
+    elif kind == "onboard" and roll < config["timeout_rate"] + config["failure_rate"]:
+        outcome = "failure"
+    elif kind == "onboard" and roll < config["timeout_rate"] + config["failure_rate"] + config["stale_etag_rate"]:
+        outcome = "stale_etag"
+    else:
+        outcome = "success"
+    name = f"operations/{uuid.uuid4().hex}"
+    record = {"kind": kind, "done_at": time.time() + random.uniform(low, high), "outcome": outcome,
+              "guids": list(guids), "sent_etags": sent_etags or {}}
+    with open(os.path.join(state_dir(), name.split("/", 1)[1] + ".json"), "w") as f:
+        json.dump(record, f)
+    print(f'name: "{name}"')
+    print(f'metadata {{ state: RUNNING }}')
+
+
+def operation_payload(record, name, config):
+    if time.time() < record["done_at"]:
+        return f'name: "{name}"\nmetadata {{ state: RUNNING }}\n'.encode("utf-8")
+    if record["kind"] == "export":
+        source = config.get("export_source")
+        if not source:
+            return f'name: "{name}"\ndone: true\nerror {{ code: 5 message: "NOT_FOUND: no export_source configured" }}\n'.encode()
+        with open(source, "rb") as f:
+            return f.read()
+    if record["outcome"] == "timeout":
+        return f'name: "{name}"\ndone: true\nerror {{ code: 4 message: "DEADLINE_EXCEEDED: onboard operation timed out" }}\n'.encode()
+    if record["outcome"] == "failure":
+        return f'name: "{name}"\ndone: true\nerror {{ code: 3 message: "INVALID_ARGUMENT: entity validation failed" }}\n'.encode()
+    if record["outcome"] == "stale_etag":
+        return f'name: "{name}"\ndone: true\nerror {{ code: 10 message: "ABORTED: etag mismatch for entity" }}\n'.encode()
+    entities = ""
+    if config.get("report_etags"):
+        new_etags = record.get("new_etags") or {guid: uuid.uuid4().hex[:16] for guid in record.get("guids", ())}
+        entities = "".join(f' entities {{ guid: "{guid}" etag: "{etag}" }}' for guid, etag in new_etags.items())
+    return f'name: "{name}"\ndone: true\nresponse {{ Successfully completed onboard operation.{entities} }}\n'.encode()
+
+
+def main(argv):
+    config = load_config()
+    method, flags, request = parse_args(argv)
+    simulate_latency(config)
+
+    if method == "OnboardBuilding":
+        topology = flags.get("topology_file", "")
+        path = None
+        if topology.startswith("readfile(") and topology.endswith(")"):
+            path = topology[len("readfile("):-1]
+            if not os.path.isfile(path):
+                print(f"Could not read file {path}", file=sys.stderr)
+                return 1
+        start_operation("onboard", config, topology_guids(path) if path and config.get("report_etags") else (),
+                        topology_etags(path) if path and config.get("check_etags") else None)
+        return 0
+
+    if method == "ExportBuildingConfig":
+        start_operation("export", config)
+        return 0
+
+    if method == "GetOperation":
+        marker = "operation_name: '"
+        if marker not in request:
+            print("INVALID_ARGUMENT: operation_name is required", file=sys.stderr)
+            return 1
+        name = request.split(marker, 1)[1].split("'", 1)[0]
+        record_path = os.path.join(state_dir(), name.split("/", 1)[-1] + ".json")
+        try:
+            with open(record_path, "r") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            print(f"NOT_FOUND: operation {name}", file=sys.stderr)
+            return 1
+        if record["kind"] == "onboard" and time.time() >= record["done_at"] and not record.get("resolved"):
+            resolve_onboard(record, config)
+            with open(record_path, "w") as f:
+                json.dump(record, f)
+        payload = BINARY_PREFIX + operation_payload(record, name, config)
+        outfile = flags.get("outfile")
+        if outfile:
+            with open(outfile, "wb") as f:
+                f.write(payload)
+        else:
+            sys.stdout.write(payload.decode("utf-8", errors="ignore"))
+        return 0
+
+    print(f"UNIMPLEMENTED: {method}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
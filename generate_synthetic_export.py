@@ -0,0 +1,132 @@
+"""Generate realistic synthetic ABEL exports for benchmarking.
+
+The export has CONFIG_METADATA, one FACILITIES/BUILDING, reporting entities
+with a `translation` block (UPDATE operations), and virtual entities whose
+`links` point at reporting entities, split between ADD and UPDATE operations.
+Output is written incrementally, so campus-sized exports (hundreds of
+thousands of entities) don't have to fit in memory.
+
+Usage: python3 generate_synthetic_export.py OUTPUT.yaml [--reporting N] [--virtual N] [--fan-out N] ...
+"""
+import argparse
+import random
+import uuid
+
+POINTS = [
+    ("zone_air_temperature_sensor", "degrees_celsius", "degC"),
+    ("zone_air_temperature_setpoint", "degrees_celsius", "degC"),
+    ("supply_air_flowrate_sensor", "cubic_meters_per_second", "m3/s"),
+    ("discharge_air_temperature_sensor", "degrees_celsius", "degC"),
+    ("zone_air_relative_humidity_sensor", "percent_relative_humidity", "%RH"),
+    ("supply_air_damper_percentage_command", "percent", "%"),
+    ("zone_air_co2_concentration_sensor", "parts_per_million", "ppm"),
+    ("static_pressure_sensor", "pascals", "Pa"),
+]
+STATE_POINTS = ["run_command", "run_status", "occupancy_mode", "fan_run_command"]
+REPORTING_TYPES = ["HVAC/FCU_DFSS_CSP", "HVAC/AHU_DFSS_SFSS", "HVAC/VAV_SD_DSP", "METERS/EM_PWR"]
+VIRTUAL_TYPES = ["HVAC/VAV_SD_DSP_CO2C", "HVAC/ZONE_ZTC", "HVAC/FCU_DFSS_ZTC"]
+
+
+def _translation(rng, prefix):
+    lines = ["  translation:\n"]
+    for name, unit, symbol in rng.sample(POINTS, rng.randint(2, 5)):
+        lines.append(
+            f"    {name}:\n"
+            f"      present_value: points.{name}.present_value\n"
+            f"      units:\n"
+            f"        key: pointset.points.{name}.units\n"
+            f"        values:\n"
+            f"          {unit}: '{symbol}'\n"
+        )
+    for name in rng.sample(STATE_POINTS, rng.randint(0, 2)):
+        lines.append(
+            f"    {name}:\n"
+            f"      present_value: points.{name}.present_value\n"
+            f"      states:\n"
+            f"        ON: '{prefix}_on'\n"
+            f"        OFF: '{prefix}_off'\n"
+        )
+    return lines
+
+
+def iter_export_chunks(reporting=1000, virtual=None, fan_out=3, add_fraction=0.5, seed=0):
+    """Yield the export text in chunks, one top-level block at a time.
+
+    virtual defaults to a third of reporting. Each virtual entity links to fan_out distinct
+    reporting entities (fewer if there aren't enough); add_fraction of them use operation ADD.
+    """
+    rng = random.Random(seed)
+    new_guid = lambda: str(uuid.UUID(int=rng.getrandbits(128)))
+    if virtual is None:
+        virtual = reporting // 3
+
+    yield "CONFIG_METADATA:\n  operation: UPDATE\n"
+    yield (f"{new_guid()}:\n  code: US-BNC-SYN\n  type: FACILITIES/BUILDING\n  etag: '{rng.getrandbits(40)}'\n"
+           "  operation: UPDATE\n  update_mask:\n  - DISPLAY_NAME\n  display_name: Synthetic building\n")
+
+    reporting_guids = []
+    for i in range(reporting):
+        guid = new_guid()
+        reporting_guids.append(guid)
+        lines = [
+            f"{guid}:\n",
+            f"  code: DEV-{i}\n",
+            f"  type: {rng.choice(REPORTING_TYPES)}\n",
+            f"  etag: '{rng.getrandbits(40)}'\n",
+            f"  cloud_device_id: '{rng.getrandbits(52)}'\n",
+            "  operation: UPDATE\n",
+            "  update_mask:\n  - TRANSLATION\n  - Cloud_Device_ID\n",
+        ]
+        lines += _translation(rng, "on" if i % 2 else "active")
+        if rng.random() < 0.1:
+            lines.append("  connections:\n")
+            lines.append(f"    {rng.choice(reporting_guids)}: CONTAINS\n")
+        yield "".join(lines)
+
+    for i in range(virtual):
+        guid = new_guid()
+        adding = rng.random() < add_fraction
+        targets = rng.sample(reporting_guids, min(fan_out, len(reporting_guids)))
+        lines = [
+            f"{guid}:\n",
+            f"  code: VIRT-{i}\n",
+            f"  type: {rng.choice(VIRTUAL_TYPES)}\n",
+        ]
+        if not adding:
+            lines.append(f"  etag: '{rng.getrandbits(40)}'\n")
+        lines.append(f"  operation: {'ADD' if adding else 'UPDATE'}\n")
+        lines.append("  update_mask:\n  - LINKS\n")
+        lines.append("  links:\n")
+        for target in targets:
+            name, _, _ = rng.choice(POINTS)
+            lines.append(f"    {target}:\n      {name}: {name}\n")
+        yield "".join(lines)
+
+
+def export_text(**kwargs):
+    return "".join(iter_export_chunks(**kwargs))
+
+
+def write_export(path, **kwargs):
+    with open(path, "w") as f:
+        for chunk in iter_export_chunks(**kwargs):
+            f.write(chunk)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="path of the export to write")
+    parser.add_argument("--reporting", type=int, default=1000, help="reporting entities")
+    parser.add_argument("--virtual", type=int, default=None, help="virtual entities (default: reporting / 3)")
+    parser.add_argument("--fan-out", type=int, default=3, help="links per virtual entity")
+    parser.add_argument("--add-fraction", type=float, default=0.5, help="fraction of virtual entities that are ADDs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_export(args.output, reporting=args.reporting, virtual=args.virtual, fan_out=args.fan_out,
+                 add_fraction=args.add_fraction, seed=args.seed)
+    print(f"Wrote synthetic export to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Forward/reverse link index for an ABEL export, built once per run.
+
+forward maps every entity that has a `links` field to its link targets (in
+file order); reverse maps each link target to the entities that link to it.
+validate() checks the whole graph in one pass so a bad export is rejected
+before any file is written, and shared_link_groups() finds virtual entities
+whose link sets overlap so they can be packed into the same file.
+"""
+from collections import OrderedDict
+import batch_packing
+
+# Used to cap link groups when no packing budget was given
+DEFAULT_GROUP_BUDGET = batch_packing.PackingBudget(max_entities=25)
+
+
+class LinkGraph:
+    def __init__(self, forward, known_guids, linking_guids):
+        self.forward = forward
+        self.known_guids = known_guids
+        self.linking_guids = linking_guids
+        self.reverse = OrderedDict()
+        for source, targets in forward.items():
+            for target in targets:
+                self.reverse.setdefault(target, []).append(source)
+
+    @classmethod
+    def from_config(cls, config, sources):
+        """Build from a loaded export (guid -> content dict) for the linking entities in sources."""
+        linking_guids = {guid for guid, content in config.items() if isinstance(content, dict) and "links" in content}
+        forward = OrderedDict((guid, tuple(content["links"])) for guid, content in sources.items()
+                              if guid in linking_guids)
+        return cls(forward, set(config), linking_guids)
+
+    @classmethod
+    def from_index(cls, index, categories, extra_guids=()):
+        """Build from process_ABEL_output.index_export's guid -> (offset, length, category, links) index.
+
+        Only entities whose category is in categories contribute links.
+        """
+        linking_guids = {guid for guid, entry in index.items() if entry[3] is not None}
+        forward = OrderedDict((guid, entry[3]) for guid, entry in index.items()
+                              if entry[3] is not None and entry[2] in categories)
+        return cls(forward, set(index).union(extra_guids), linking_guids)
+
+    def recursive_links(self):
+        """Link targets that have links of their own, which ABEL does not allow."""
+        return [target for target in self.reverse if target in self.linking_guids]
+
+    def dangling_links(self):
+        """Link targets that are not in the export."""
+        return [target for target in self.reverse if target not in self.known_guids]
+
+    def validate(self):
+        """Print every link problem at once; returns False if the export must be rejected."""
+        for target in self.dangling_links():
+            print(f"WARNING: Linked GUID {target} not found in original config "
+                  f"(linked from {len(self.reverse[target])} entities).")
+        recursive = self.recursive_links()
+        for target in recursive:
+            print(f"ERROR: Linked GUID {target} contains links. Recursive links not allowed.")
+        return not recursive
+
+    def shared_link_groups(self, guids):
+        """Partition guids into groups whose link sets overlap (directly or transitively).
+
+        Groups and their members keep the order of guids, so output stays deterministic.
+        """
+        members = OrderedDict((guid, None) for guid in guids)
+        parent = {guid: guid for guid in members}
+
+        def find(guid):
+            while parent[guid] != guid:
+                parent[guid] = parent[parent[guid]]
+                guid = parent[guid]
+            return guid
+
+        for sources in self.reverse.values():
+            sources = [source for source in sources if source in members]
+            for source in sources[1:]:
+                root_a, root_b = find(sources[0]), find(source)
+                if root_a != root_b:
+                    parent[root_b] = root_a
+
+        groups = OrderedDict()
+        for guid in members:
+            groups.setdefault(find(guid), []).append(guid)
+        return list(groups.values())
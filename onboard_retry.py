@@ -0,0 +1,113 @@
+"""Failure classification, deferred retries and a circuit breaker for onboarding.
+
+A failed onboard is classified from how it failed and from the operation
+result text:
+    transient   the file was never accepted (stubby error, no operation name)
+    timeout     the operation hit DEADLINE_EXCEEDED, or was still running when polling gave up
+    stale_etag  the service rejected an etag (ABORTED / FAILED_PRECONDITION mentioning etags)
+    validation  the service rejected the content (INVALID_ARGUMENT)
+    unknown     anything else
+Transient, timeout and stale_etag failures are retried at the end of the
+pass under RetryPolicy; validation and unknown failures are not, because
+sending the same file again gives the same answer.
+
+CircuitBreaker watches the recent outcomes that say something about the
+backend's health (successes, timeouts and transient failures). When too many
+of them failed it pauses new submissions for a cooldown, so an overloaded
+backend isn't fed operations that will only time out.
+"""
+import collections
+import random
+import re
+import threading
+import time
+import telemetry
+
+TRANSIENT = "transient"
+TIMEOUT = "timeout"
+STALE_ETAG = "stale_etag"
+VALIDATION = "validation"
+UNKNOWN = "unknown"
+
+RETRYABLE = (TRANSIENT, TIMEOUT, STALE_ETAG)
+# Failures that mean the backend is struggling, as opposed to something wrong with one file
+BACKEND_FAILURES = (TRANSIENT, TIMEOUT)
+
+_STALE_ETAG = re.compile(r"\b(ABORTED|FAILED_PRECONDITION)\b[^\n]*\betag|\betag\b[^\n]*\b(mismatch|stale|outdated)\b",
+                         re.I)
+_TIMEOUT = re.compile(r"\bDEADLINE_EXCEEDED\b|\brunning\b", re.I)
+_VALIDATION = re.compile(r"\bINVALID_ARGUMENT\b")
+_TRANSIENT = re.compile(r"\b(UNAVAILABLE|RESOURCE_EXHAUSTED|INTERNAL)\b")
+
+
+def classify_failure(result_text, submitted=True):
+    """Kind of failure for a failed onboard; submitted is False if no operation was started."""
+    if not submitted:
+        return TRANSIENT
+    if _STALE_ETAG.search(result_text):
+        return STALE_ETAG
+    if _TIMEOUT.search(result_text):
+        return TIMEOUT
+    if _VALIDATION.search(result_text):
+        return VALIDATION
+    if _TRANSIENT.search(result_text):
+        return TRANSIENT
+    return UNKNOWN
+
+
+class RetryPolicy:
+    """How many deferred retry rounds to run and how long to wait before each."""
+
+    def __init__(self, max_retries=2, base_delay=60.0, factor=2.0, max_delay=600.0, jitter=0.2):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, retry_round):
+        delay = min(self.max_delay, self.base_delay * (self.factor ** (retry_round - 1)))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class CircuitBreaker:
+    """Pauses submissions while the recent backend failure rate is at or above failure_threshold.
+
+    The rate is taken over the last `window` health outcomes once at least
+    min_outcomes are known. Tripping clears the window, so after the cooldown
+    submissions resume and the next outcomes decide whether it trips again.
+    """
+
+    def __init__(self, window=20, failure_threshold=0.5, min_outcomes=5, cooldown=120.0):
+        self.failure_threshold = failure_threshold
+        self.min_outcomes = min_outcomes
+        self.cooldown = cooldown
+        self.trips = 0
+        self._outcomes = collections.deque(maxlen=window)
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, failure_kind):
+        """Record an onboard outcome: None for success, else its failure kind."""
+        if failure_kind is not None and failure_kind not in BACKEND_FAILURES:
+            return
+        with self._lock:
+            self._outcomes.append(failure_kind is not None)
+            failures = sum(self._outcomes)
+            if (len(self._outcomes) >= self.min_outcomes
+                    and failures / len(self._outcomes) >= self.failure_threshold):
+                print(f"⚠️ {failures} of the last {len(self._outcomes)} onboards failed; "
+                      f"pausing new submissions for {self.cooldown:.0f}s")
+                self._open_until = time.monotonic() + self.cooldown
+                self._outcomes.clear()
+                self.trips += 1
+
+    def wait(self):
+        """Block until submissions are allowed."""
+        while True:
+            with self._lock:
+                remaining = self._open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            with telemetry.span("circuit_open", seconds=round(remaining, 1)):
+                time.sleep(remaining)
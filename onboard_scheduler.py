@@ -0,0 +1,84 @@
+"""Dependency-aware ordering of config files for parallel onboarding.
+
+Onboarding a file gives every entity in it a new etag, including the linked
+reporting devices copied into virtual-entity files. Two files that contain
+the same GUID therefore can't safely be in flight together: whichever goes
+second would be sent with an etag the first has just replaced. Files are
+ordered by category (update_reporting, then update_virtual, then add_virtual)
+and then by name. A file waits for the most recent earlier file that shares
+each of its GUIDs (entity_records.entity_guids: CONFIG_METADATA and the
+building, which every file carries, don't count). Everything else runs in
+parallel as soon as a worker is free.
+"""
+import os
+import threading
+
+CATEGORY_ORDER = ("update_reporting_entities", "update_virtual_entities", "add_virtual_entities")
+
+
+def schedule_key(config_path):
+    """Sort key putting files in category order, then by name; unknown folders go last."""
+    folder = os.path.basename(os.path.dirname(config_path))
+    rank = CATEGORY_ORDER.index(folder) if folder in CATEGORY_ORDER else len(CATEGORY_ORDER)
+    return rank, os.path.basename(config_path)
+
+
+class DependencyScheduler:
+    """Submit jobs to an executor, holding each one until the earlier jobs sharing its GUIDs finish.
+
+    Jobs must be added in schedule order; a job only ever waits on jobs added before it, so
+    there are no cycles. wait() returns {key: future} once every added job has finished.
+    """
+
+    def __init__(self, executor, run):
+        self._executor = executor
+        self._run = run
+        self._condition = threading.Condition()
+        self._last_holder = {}
+        self._waiting = {}
+        self._dependents = {}
+        self._finished = {}
+        self._outstanding = 0
+        self.depth = {}
+        self.held = 0
+
+    def add(self, key, guids, *args):
+        with self._condition:
+            prerequisites = {self._last_holder[guid] for guid in guids
+                             if guid in self._last_holder} - {key}
+            for guid in guids:
+                self._last_holder[guid] = key
+            self.depth[key] = 1 + max((self.depth[p] for p in prerequisites), default=0)
+            prerequisites -= self._finished.keys()
+            self._outstanding += 1
+            if prerequisites:
+                self.held += 1
+                self._waiting[key] = [len(prerequisites), args]
+                for prerequisite in prerequisites:
+                    self._dependents.setdefault(prerequisite, []).append(key)
+                return
+        self._submit(key, args)
+
+    def _submit(self, key, args):
+        future = self._executor.submit(self._run, *args)
+        future.add_done_callback(lambda done: self._on_done(key, done))
+
+    def _on_done(self, key, future):
+        ready = []
+        with self._condition:
+            self._finished[key] = future
+            for dependent in self._dependents.pop(key, ()):
+                waiting = self._waiting[dependent]
+                waiting[0] -= 1
+                if waiting[0] == 0:
+                    ready.append((dependent, self._waiting.pop(dependent)[1]))
+            self._outstanding -= 1
+            self._condition.notify_all()
+        for dependent, args in ready:
+            self._submit(dependent, args)
+
+    def wait(self):
+        with self._condition:
+            while self._outstanding:
+                self._condition.wait()
+            return dict(self._finished)
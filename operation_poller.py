@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import telemetry
+
+
+class OperationTimeout(Exception):
+    """Raised when an operation is still running at its deadline."""
+
+
+class PollPolicy:
+    """Jittered exponential backoff with a per-operation deadline.
+
+    The first check is scheduled from the median duration of recently completed
+    operations using this policy, so repeated work converges on checking just
+    after operations usually finish instead of at a fixed step.
+    """
+
+    def __init__(self, initial_delay=10.0, min_delay=5.0, max_delay=60.0, factor=1.5,
+                 jitter=0.2, deadline=None, history=20):
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.deadline = deadline
+        self._durations = []
+        self._history = history
+        self._lock = threading.Lock()
+
+    def observe(self, duration):
+        """Record how long a completed operation took."""
+        with self._lock:
+            self._durations.append(duration)
+            del self._durations[:-self._history]
+
+    def first_delay(self):
+        with self._lock:
+            durations = list(self._durations)
+        delay = statistics.median(durations) * 0.8 if durations else self.initial_delay
+        return self._jittered(min(self.max_delay, max(self.min_delay, delay)))
+
+    def next_delay(self, checks):
+        delay = min(self.max_delay, self.min_delay * (self.factor ** checks))
+        return self._jittered(delay)
+
+    def _jittered(self, delay):
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class _PendingOperation:
+    def __init__(self, operation_name, check, policy, deadline):
+        self.operation_name = operation_name
+        self.check = check
+        self.policy = policy
+        self.deadline = deadline
+        self.started = time.monotonic()
+        self.checks = 0
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class PollScheduler:
+    """Single polling loop serving every in-flight operation.
+
+    Outstanding operations sit in a priority queue ordered by next check time.
+    When an operation comes due, the loop hands `check(attempt)` to a small
+    thread pool (each check is a stubby subprocess), so one slow call doesn't
+    delay every other due operation. `check` returns None while the operation
+    is still running, or its final result otherwise.
+    """
+
+    def __init__(self, check_workers=8):
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=check_workers, thread_name_prefix="operation-check")
+
+    def submit(self, operation_name, check, policy):
+        now = time.monotonic()
+        deadline = now + policy.deadline if policy.deadline is not None else None
+        op = _PendingOperation(operation_name, check, policy, deadline)
+        self._schedule(op, now + policy.first_delay())
+        return op
+
+    def wait(self, operation_name, check, policy):
+        """Block until the operation finishes and return the result of its final check."""
+        with telemetry.span("poll_wait", operation=operation_name) as record:
+            op = self.submit(operation_name, check, policy)
+            op.done.wait()
+            record["attempts"] = op.checks
+            if op.error is not None:
+                record["outcome"] = "timeout" if isinstance(op.error, OperationTimeout) else "error"
+                raise op.error
+        return op.result
+
+    def _schedule(self, op, when):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="operation-poller", daemon=True)
+                self._thread.start()
+            heapq.heappush(self._queue, (when, next(self._counter), op))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                when, _, op = self._queue[0]
+                now = time.monotonic()
+                if when > now:
+                    self._condition.wait(when - now)
+                    continue
+                heapq.heappop(self._queue)
+            self._executor.submit(self._poll, op)
+
+    def _poll(self, op):
+        op.checks += 1
+        try:
+            result = op.check(op.checks)
+        except Exception as e:
+            op.error = e
+            op.done.set()
+            return
+
+        now = time.monotonic()
+        if result is not None:
+            op.policy.observe(now - op.started)
+            op.result = result
+            op.done.set()
+            return
+
+        delay = op.policy.next_delay(op.checks)
+        if op.deadline is not None and now >= op.deadline:
+            op.error = OperationTimeout(
+                f"Operation {op.operation_name} still running after {now - op.started:.0f} seconds")
+            op.done.set()
+            return
+        if op.deadline is not None:
+            # Make the last check land on the deadline rather than past it
+            delay = min(delay, op.deadline - now)
+        self._schedule(op, now + delay)
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    """Process-wide scheduler shared by onboarding and export polling."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = PollScheduler()
+        return _default_scheduler
+
+
+def wait_for_operation(operation_name, check, policy):
+    return default_scheduler().wait(operation_name, check, policy)
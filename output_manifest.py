@@ -0,0 +1,199 @@
+"""Content-hash manifest of the split files produced by process_ABEL_output.
+
+The manifest lives next to the ABEL export (abel_manifest.json). It records
+the shared header's hash, each output file's content hash and GUIDs, and for
+each entity a file was produced for: the hash of its content, the hashes of
+its copied link targets (its link closure) and the file it went to. Re-runs
+use it to keep file names stable per entity, skip rendering files whose
+header, entities and link closures are all unchanged, and delete files that
+no longer correspond to any entity. The onboarding stage uses the file
+hashes to skip files whose content has already been onboarded.
+"""
+import hashlib
+import json
+import os
+import re
+
+MANIFEST_NAME = "abel_manifest.json"
+
+_PART_PATTERN = re.compile(r"_config_pt(\d+)\.yaml$")
+
+# Process-wide cache: manifest path -> (mtime_ns, files)
+_manifest_cache = {}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def entity_hash(content):
+    """Hash of an entity's parsed content; stable from run to run and far cheaper than rendering it."""
+    return hashlib.sha256(repr(content).encode("utf-8")).hexdigest()
+
+
+def primary_guids(entities):
+    """GUIDs a file was produced for: entities with links, or every entity if none has links.
+
+    Copied link targets never carry links themselves, so they are excluded.
+    """
+    with_links = [guid for guid, content in entities.items() if isinstance(content, dict) and "links" in content]
+    return with_links or list(entities)
+
+
+def _read_manifest(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Warning: couldn't read manifest {path}, regenerating all files: {e}")
+        return {}
+
+
+def _write_manifest(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+class OutputManifest:
+    def __init__(self, base_dir, header=b""):
+        self.base_dir = base_dir
+        self.path = os.path.join(base_dir, MANIFEST_NAME)
+        old = _read_manifest(self.path)
+        self.old_files = old.get("files", {})
+        self.old_guids = old.get("guids", {})
+        self.header_hash = content_hash(header)
+        # A changed header changes every file, so nothing can be reused
+        self.header_unchanged = old.get("header") == self.header_hash
+        self.files = {}
+        self.guids = {}
+
+    def _rel(self, path):
+        return os.path.relpath(path, self.base_dir).replace(os.sep, "/")
+
+    def plan(self, jobs, output_folder, category_name):
+        """Give each (out_path, entities) job a stable file name and the hash its file had last run.
+
+        Entities that were already written keep their previous file name; new ones take the
+        lowest free part numbers. Returns (out_path, entities, expected_hash) jobs.
+        """
+        folder_rel = self._rel(output_folder)
+        previous = {}
+        for rel, entry in self.old_files.items():
+            if os.path.dirname(rel) == folder_rel:
+                previous[tuple(entry["primary"])] = rel
+
+        names = [None] * len(jobs)
+        taken = set()
+        for i, (_, entities) in enumerate(jobs):
+            rel = previous.get(tuple(primary_guids(entities)))
+            if rel is not None and rel not in taken:
+                names[i] = rel
+                taken.add(rel)
+
+        used_parts = {int(m.group(1)) for m in map(_PART_PATTERN.search, taken) if m}
+        next_part = 1
+        for i in range(len(jobs)):
+            if names[i] is not None:
+                continue
+            while next_part in used_parts:
+                next_part += 1
+            used_parts.add(next_part)
+            names[i] = f"{folder_rel}/{category_name}_config_pt{next_part}.yaml"
+
+        planned = []
+        for rel, (_, entities) in zip(names, jobs):
+            expected = self.old_files.get(rel, {}).get("hash")
+            planned.append((os.path.join(self.base_dir, *rel.split("/")), entities, expected))
+        return planned
+
+    @staticmethod
+    def _entries(entities, rel, guid_hashes):
+        """guid -> {hash, file, links} for each entity the file was produced for."""
+        entries = {}
+        for guid in primary_guids(entities):
+            content = entities[guid]
+            links = content["links"] if isinstance(content, dict) and "links" in content else ()
+            entries[guid] = {"hash": guid_hashes[guid], "file": rel,
+                             "links": {linked: guid_hashes[linked] for linked in links if linked in guid_hashes}}
+        return entries
+
+    def unchanged_hash(self, out_path, entities, guid_hashes):
+        """Content hash of out_path if last run wrote exactly these entities to it, else None.
+
+        guid_hashes maps every GUID in entities to its entity_hash. The file doesn't need
+        rendering again when the header, the file's GUIDs, and each of its entities and link
+        closures hash the same as last run.
+        """
+        rel = self._rel(out_path)
+        old = self.old_files.get(rel)
+        if (not self.header_unchanged or old is None or old["guids"] != list(entities)
+                or not os.path.exists(out_path)):
+            return None
+        for guid, entry in self._entries(entities, rel, guid_hashes).items():
+            if self.old_guids.get(guid) != entry:
+                return None
+        return old["hash"]
+
+    def record(self, out_path, entities, file_hash, guid_hashes):
+        rel = self._rel(out_path)
+        self.files[rel] = {"hash": file_hash, "primary": primary_guids(entities), "guids": list(entities)}
+        self.guids.update(self._entries(entities, rel, guid_hashes))
+
+    def remove_stale(self):
+        """Delete files from the previous run that this run did not produce."""
+        removed = 0
+        for rel in self.old_files:
+            if rel in self.files:
+                continue
+            path = os.path.join(self.base_dir, *rel.split("/"))
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        if removed:
+            print(f"Removed {removed} stale config file(s)")
+
+    def save(self):
+        _write_manifest(self.path, {"header": self.header_hash, "files": self.files, "guids": self.guids})
+
+
+def record_rewritten(base_dir, written):
+    """Record files written outside process_file (by the streaming writers) in base_dir's manifest.
+
+    written maps out_path -> (content_hash, guids), guids listing the file's entities with the
+    one it was produced for first. Without this the onboarding stage would keep skipping a
+    rewritten file under the hash of what process_file last wrote there. The files' per-entity
+    entries are dropped, so the next process_file renders them again rather than trusting them.
+    """
+    path = os.path.join(base_dir, MANIFEST_NAME)
+    data = _read_manifest(path)
+    files = data.setdefault("files", {})
+    rewritten = set()
+    for out_path, (file_hash, guids) in written.items():
+        rel = os.path.relpath(out_path, base_dir).replace(os.sep, "/")
+        files[rel] = {"hash": file_hash, "primary": list(guids[:1]), "guids": list(guids)}
+        rewritten.add(rel)
+    data["guids"] = {guid: entry for guid, entry in data.get("guids", {}).items()
+                     if entry.get("file") not in rewritten}
+    _write_manifest(path, data)
+
+
+def lookup_content_hash(cfg_path):
+    """Content hash recorded for a split config file, or None if it isn't in a manifest."""
+    cfg_path = os.path.abspath(cfg_path)
+    base_dir = os.path.dirname(os.path.dirname(cfg_path))
+    path = os.path.join(base_dir, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _manifest_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, _read_manifest(path).get("files", {}))
+        _manifest_cache[path] = cached
+    rel = os.path.relpath(cfg_path, base_dir).replace(os.sep, "/")
+    entry = cached[1].get(rel)
+    return entry["hash"] if entry else None
@@ -0,0 +1,101 @@
+"""Process an ABEL export and onboard its split files in one streaming pass.
+
+Instead of process_ABEL_output writing every file before execute_API_calls_series
+lists, re-reads and sync_etags-rewrites them, split files are produced one at a
+time (process_ABEL_output.iter_streaming_files) with their etags already joined
+from the building config's etag index, written once, and handed straight to
+the onboarding workers. The first OnboardBuilding call goes out as soon as the
+export is indexed and the first file is written.
+
+stubby reads the topology file from disk, so each file is still written once.
+Files are kept in the usual category folders next to the export; answer N to
+the keep prompt (keep_files=False) to delete each one after it has been
+onboarded successfully. Results and run state are kept as usual.
+"""
+import os
+import sys
+import execute_API_calls_series
+import export_cache
+import output_manifest
+import process_ABEL_output
+import profiling
+import rate_limiter
+import run_state
+import transfer_etags
+
+
+def run_pipeline(input_file, building_code, building_config_path, max_workers=1, limiter=None, keep_files=True,
+                 retry_policy=None, breaker=None):
+    """Split input_file and onboard every file as it is produced; returns result_files.
+
+    retry_policy and breaker are passed on to execute_API_calls_series.onboard_config_files.
+    """
+    base_dir = os.path.dirname(input_file)
+    etags = transfer_etags.load_etag_index(building_config_path)
+    joined_etags = {}
+    content_hashes = {}
+
+    def produce():
+        written = {}
+        for folder_name, out_name, header, body, joined, source_hash, guids in \
+                process_ABEL_output.iter_streaming_files(input_file, etags=etags):
+            folder = os.path.join(base_dir, folder_name)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, out_name)
+            process_ABEL_output.write_rendered_file(path, header, body)
+            # Registered before the path is handed on, so the worker sees them
+            joined_etags[path] = joined
+            content_hashes[path] = source_hash
+            written[path] = (source_hash, guids)
+            yield path
+        # Under the hash the run state records them with, so a later execute_API_calls_series run agrees
+        output_manifest.record_rewritten(base_dir, written)
+
+    result_files = execute_API_calls_series.onboard_config_files(
+        building_code, produce(), building_config_path, max_workers=max_workers, limiter=limiter,
+        retry_policy=retry_policy, breaker=breaker, joined_etags=joined_etags, content_hashes=content_hashes)
+
+    if not keep_files:
+        by_root = {}
+        for result_file, cfg, _ in result_files:
+            by_root.setdefault(os.path.dirname(os.path.dirname(result_file)), []).append(cfg)
+        removed = 0
+        for results_root, cfgs in by_root.items():
+            for path, row in run_state.open_store(results_root).statuses(cfgs).items():
+                if row["status"] == run_state.SUCCEEDED and os.path.exists(path):
+                    os.remove(path)
+                    removed += 1
+        print(f"Removed {removed} onboarded config file(s); failed files were kept")
+    return result_files
+
+
+# ----------------------------
+# Main script
+# ----------------------------
+if __name__ == "__main__":
+    profiling.install("pipeline")
+    input_file = input("Enter the absolute path to the yaml file exported by ABEL: ").strip()
+    if not os.path.isfile(input_file):
+        print(f"ERROR: File not found: {input_file}")
+        sys.exit(1)
+    building_code = input("Enter building code (format US-XXX-YYY): ").strip()
+
+    building_config_path = input("\nEnter absolute path to the existing building config.yaml "
+                                 "(blank to use the cached export for this building): ").strip()
+    if not building_config_path:
+        building_config_path = export_cache.get_building_config(building_code)
+        if building_config_path is None:
+            sys.exit(1)
+    elif not os.path.isfile(building_config_path):
+        print(f"ERROR: File not found: {building_config_path}")
+        sys.exit(1)
+
+    max_workers_input = input("How many files should be onboarded in parallel? [1]: ").strip()
+    max_workers = int(max_workers_input) if max_workers_input else 1
+    rate_input = input("Maximum stubby calls per second (blank for unlimited): ").strip()
+    limiter = rate_limiter.TokenBucket(float(rate_input)) if rate_input else None
+    keep_files = input("Keep config files after they are onboarded? Y/N: ").strip().lower() != "n"
+
+    result_files = run_pipeline(input_file, building_code, building_config_path, max_workers=max_workers,
+                                limiter=limiter, keep_files=keep_files)
+    execute_API_calls_series.analyze_results(result_files)
@@ -0,0 +1,114 @@
+"""Local checks that reject config files which would certainly fail onboarding.
+
+Every OnboardBuilding round trip costs at least one poll interval, so files
+that can't succeed are caught here first:
+    - the building code isn't of the form US-XXX-YYY
+    - an entity is neither in the building config nor being added (operation ADD)
+    - an entity that isn't being added has no etag in the building config
+    - a link points at a GUID that is neither in the file nor in the building config
+    - the file can't be read or parsed
+
+Files are checked against the building config's GUID -> etag index (see
+transfer_etags) using entity_records, so only the routing fields of each
+entity are parsed. Failing files are moved to a quarantine folder next to the
+category folders, with their reasons in <file>.reasons.txt.
+"""
+import os
+import re
+import shutil
+import entity_records
+import transfer_etags
+import worker_pool
+
+BUILDING_CODE = re.compile(r"[A-Za-z]{2}-[A-Za-z0-9]+-[A-Za-z0-9-]+")
+QUARANTINE_DIR = "quarantine"
+# Checking a file costs far less than rendering one, so a pool needs more files to pay off
+PARALLEL_PREFLIGHT_MIN_FILES = 200
+
+
+def check_building_code(building_code):
+    """Reason the building code is invalid, or None."""
+    if not BUILDING_CODE.fullmatch(building_code or ""):
+        return f"Invalid building code {building_code!r}. Expected: US-XXX-YYY"
+    return None
+
+
+def check_config_file(config_path, etags):
+    """Reasons config_path would fail to onboard against the etag index; empty if it looks fine."""
+    try:
+        records = entity_records.read_records(config_path)
+    except Exception as e:
+        return [f"unreadable config file: {' '.join(str(e).split())}"]
+
+    reasons = []
+    guids = {record.guid for record in records}
+    for record in records:
+        guid = record.guid
+        if guid == "CONFIG_METADATA":
+            continue
+        if record.operation != "ADD":
+            if guid not in etags:
+                reasons.append(f"{guid}: not in the building config and not being added")
+            elif etags[guid] is None:
+                reasons.append(f"{guid}: no etag in the building config")
+        for linked_guid in record.links or ():
+            if linked_guid not in guids and linked_guid not in etags:
+                reasons.append(f"{guid}: link to {linked_guid}, which is neither in the file nor the building")
+    return reasons
+
+
+def _check_with_etags(etags, config_path):
+    return check_config_file(config_path, etags)
+
+
+def check_config_files(config_files, building_config_path, workers=1):
+    """Map each config file to its list of reasons; checked in a process pool if workers > 1."""
+    etags = transfer_etags.load_etag_index(building_config_path)
+    results, _ = worker_pool.map_shared(_check_with_etags, etags, config_files, workers,
+                                        min_items=PARALLEL_PREFLIGHT_MIN_FILES)
+    return dict(zip(config_files, results))
+
+
+def quarantine_path(config_path):
+    """<root>/quarantine/<category folder>/<file> for <root>/<category folder>/<file>."""
+    category_dir = os.path.dirname(config_path)
+    return os.path.join(os.path.dirname(category_dir), QUARANTINE_DIR, os.path.basename(category_dir),
+                        os.path.basename(config_path))
+
+
+def quarantine(config_path, reasons):
+    """Move a config file out of its category folder and record why next to it."""
+    target = quarantine_path(config_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.move(config_path, target)
+    with open(target + ".reasons.txt", "w", encoding="utf-8") as f:
+        f.write("\n".join(reasons) + "\n")
+    return target
+
+
+def _reject(config_path, reasons):
+    target = quarantine(config_path, reasons)
+    print(f"🚫 Quarantined {os.path.basename(config_path)} -> {target}")
+    for reason in reasons[:5]:
+        print(f"    {reason}")
+    if len(reasons) > 5:
+        print(f"    ... and {len(reasons) - 5} more")
+
+
+def preflight_file(config_path, etags):
+    """Check one config file as it is produced; quarantines it and returns False if it would fail."""
+    reasons = check_config_file(config_path, etags)
+    if reasons:
+        _reject(config_path, reasons)
+    return not reasons
+
+
+def run_preflight(config_files, building_config_path, workers=1):
+    """Check config files and quarantine the ones that would fail; returns {path: reasons} for those."""
+    rejected = {path: reasons for path, reasons in
+                check_config_files(config_files, building_config_path, workers).items() if reasons}
+    for path, reasons in rejected.items():
+        _reject(path, reasons)
+    if config_files:
+        print(f"Pre-flight: {len(config_files) - len(rejected)}/{len(config_files)} config files passed")
+    return rejected
@@ -1,43 +1,47 @@
-import yaml
 import os
 import sys
+import time
 from collections import OrderedDict
+from yaml_io import SingleQuoted, load_yaml, render_config
+import yaml_blocks
+import entity_records
+import batch_packing
+import link_graph
+import output_manifest
+import telemetry
+import worker_pool
+import profiling
 
 
 # ----------------------------
 # YAML helpers
 # ----------------------------
-def write_yaml(file_path, data):
-    """Write YAML with OrderedDict handling, true/false -> ON/OFF, and spacing."""
-    def convert(obj):
-        if isinstance(obj, OrderedDict):
-            return {k: convert(v) for k, v in obj.items()}
-        elif isinstance(obj, dict):
-            return {k: convert(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [convert(i) for i in obj]
-        else:
-            return obj
+def _starts_top_level(line):
+    return bool(line.strip()) and not line.startswith(b" ")
 
-    normal_dict = convert(data)
-    with open(file_path, "w") as f:
-        yaml.safe_dump(normal_dict, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
 
-    # Post-process: replace true/false with ON/OFF and add blank lines between top-level entries
-    with open(file_path, "r") as f:
-        lines = f.readlines()
+def write_config_file(file_path, header, entities, expected_hash=None):
+    """Write a pre-rendered header (bytes) followed by the rendered entity section.
 
-    new_lines = []
-    for i, line in enumerate(lines):
-        line = line.replace("true", "ON").replace("false", "OFF")
-        new_lines.append(line)
-        if i + 1 < len(lines):
-            next_line = lines[i + 1]
-            if line.strip() and not line.startswith(" ") and next_line.strip() and not next_line.startswith(" "):
-                new_lines.append("\n")
+    The file is left untouched if it exists and its content hash would be expected_hash.
+    Returns (file_hash, written).
+    """
+    body = render_config(entities).encode("utf-8")
+    return write_rendered_file(file_path, header, body, expected_hash)
 
-    with open(file_path, "w") as f:
-        f.writelines(new_lines)
+
+def write_rendered_file(file_path, header, body, expected_hash=None):
+    """Write header + an already rendered body (both bytes); returns (file_hash, written)."""
+    last_header_line = header.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+    first_body_line = body.split(b"\n", 1)[0]
+    separator = b"\n" if _starts_top_level(last_header_line) and _starts_top_level(first_body_line) else b""
+    data = header + separator + body
+    file_hash = output_manifest.content_hash(data)
+    if file_hash == expected_hash and os.path.exists(file_path):
+        return file_hash, False
+    with open(file_path, "wb") as f:
+        f.write(data)
+    return file_hash, True
 
 
 # ----------------------------
@@ -52,6 +56,19 @@ def lowercase_update_mask(guid_dict):
 # ----------------------------
 # Categorize GUIDs
 # ----------------------------
+def entity_categories(has_translation, has_links, operation):
+    """Every category an entity qualifies for; more than one is a conflict."""
+    categories = []
+    if has_translation:
+        categories.append("reporting")
+    if has_links:
+        if operation == "UPDATE":
+            categories.append("update_virtual")
+        elif operation == "ADD":
+            categories.append("add_virtual")
+    return categories
+
+
 def categorize_guids(config):
     update_reporting, update_virtual, add_virtual = OrderedDict(), OrderedDict(), OrderedDict()
     conflicts = []
@@ -59,15 +76,7 @@ def categorize_guids(config):
     for guid, content in config.items():
         if not isinstance(content, dict):
             continue
-        categories = []
-        if "translation" in content:
-            categories.append("reporting")
-        if "links" in content:
-            op = content.get("operation")
-            if op == "UPDATE":
-                categories.append("update_virtual")
-            elif op == "ADD":
-                categories.append("add_virtual")
+        categories = entity_categories("translation" in content, "links" in content, content.get("operation"))
         if len(categories) > 1:
             conflicts.append((guid, categories))
         elif categories:
@@ -86,20 +95,15 @@ def categorize_guids(config):
 # Expand links
 # ----------------------------
 def expand_links(entity_dict, original_config):
+    """Add a copy of every link target to entity_dict; links must already pass LinkGraph.validate()."""
     added_guids = OrderedDict()
     for guid, content in list(entity_dict.items()):
         if "links" not in content:
             continue
         for linked_guid in content["links"]:
-            if linked_guid in added_guids or linked_guid in entity_dict:
-                continue
-            if linked_guid not in original_config:
-                print(f"WARNING: Linked GUID {linked_guid} not found in original config.")
+            if linked_guid in added_guids or linked_guid in entity_dict or linked_guid not in original_config:
                 continue
             linked_content = original_config[linked_guid]
-            if "links" in linked_content:
-                print(f"ERROR: Linked GUID {linked_guid} contains links. Recursive links not allowed.")
-                sys.exit(1)
             # Copy all fields except 'operation' and 'update_mask'
             copied_content = {k: v for k, v in linked_content.items() if k not in ("operation", "update_mask")}
             added_guids[linked_guid] = copied_content
@@ -107,23 +111,82 @@ def expand_links(entity_dict, original_config):
 
 
 # ----------------------------
-# Prepend header
+# Shared header
 # ----------------------------
-def prepend_header(entity_dict, config_metadata, building_guid, building_content):
-    new_dict = OrderedDict()
-    new_dict["CONFIG_METADATA"] = config_metadata
-    new_dict[building_guid] = building_content
-    new_dict.update(entity_dict)
-    return new_dict
+def render_header(config_metadata, building_guid, building_content):
+    """Render CONFIG_METADATA and the building block once; every split file starts with these bytes."""
+    header = OrderedDict()
+    header["CONFIG_METADATA"] = config_metadata
+    header[building_guid] = building_content
+    lowercase_update_mask(header)
+    return render_config(header).encode("utf-8")
+
+
+# ----------------------------
+# Parallel writer
+# ----------------------------
+def _write_split_file(header, job):
+    out_path, entities, expected_hash = job
+    return write_config_file(out_path, header, entities, expected_hash)
+
+
+def plan_jobs(jobs, output_folder, category_name, manifest=None):
+    """Attach the expected hash to (out_path, entities) jobs, renaming them stably when a manifest is used."""
+    if manifest is None:
+        return [(out_path, entities, None) for out_path, entities in jobs]
+    return manifest.plan(jobs, output_folder, category_name)
+
+
+def write_split_files(jobs, header, workers=1, label="files", manifest=None):
+    """Write (out_path, entities, expected_hash) jobs behind a shared header.
+
+    Work is spread across a process pool when workers > 1. With a manifest, files whose
+    entities and link closures are unchanged since the last run aren't rendered at all, and
+    every file is recorded in it.
+    """
+    with telemetry.span("process.write", category=label, files=len(jobs)) as record:
+        start = time.perf_counter()
+        results = [None] * len(jobs)
+        guid_hashes = [None] * len(jobs)
+        if manifest is not None:
+            for i, (out_path, entities, _) in enumerate(jobs):
+                guid_hashes[i] = {guid: output_manifest.entity_hash(content) for guid, content in entities.items()}
+                file_hash = manifest.unchanged_hash(out_path, entities, guid_hashes[i])
+                if file_hash is not None:
+                    results[i] = (file_hash, False)
+        to_render = [i for i, result in enumerate(results) if result is None]
+
+        rendered, workers = worker_pool.map_shared(_write_split_file, header, [jobs[i] for i in to_render],
+                                                   workers)
+        for i, result in zip(to_render, rendered):
+            results[i] = result
+        record["workers"] = workers
+        elapsed = time.perf_counter() - start
+
+        written = 0
+        for i, ((out_path, entities, _), (file_hash, was_written)) in enumerate(zip(jobs, results)):
+            written += was_written
+            if manifest is not None:
+                manifest.record(out_path, entities, file_hash, guid_hashes[i])
+        record["written"] = written
+        record["rendered"] = len(to_render)
+    if jobs:
+        rate = len(jobs) / elapsed if elapsed > 0 else float("inf")
+        unchanged = f", {len(jobs) - written} unchanged" if written < len(jobs) else ""
+        print(f"Wrote {written} {label}{unchanged} in {elapsed:.2f}s ({rate:.0f} files/s, {workers} worker(s))")
 
 
 # ----------------------------
 # Split functions
 # ----------------------------
-def split_guids_no_links_from_dict(entity_dict, output_folder, category_name, config_metadata, building_guid, building_content):
+def split_guids_no_links_from_dict(entity_dict, output_folder, category_name, config_metadata, building_guid, building_content,
+                                   workers=1, header=None, manifest=None):
     """Split in-memory dict into individual GUID files (no links)."""
     os.makedirs(output_folder, exist_ok=True)
+    if header is None:
+        header = render_header(config_metadata, building_guid, building_content)
     file_counter = 1
+    jobs = []
 
     for guid, content in entity_dict.items():
         if guid in ("CONFIG_METADATA", building_guid):
@@ -132,54 +195,117 @@ def split_guids_no_links_from_dict(entity_dict, output_folder, category_name, co
             continue
 
         new_dict = OrderedDict()
-        new_dict["CONFIG_METADATA"] = config_metadata
-        new_dict[building_guid] = building_content
         new_dict[guid] = content
 
         out_name = f"{category_name}_config_pt{file_counter}.yaml"
         out_path = os.path.join(output_folder, out_name)
-        write_yaml(out_path, new_dict)
+        jobs.append((out_path, new_dict))
         file_counter += 1
 
+    jobs = plan_jobs(jobs, output_folder, category_name, manifest)
+    write_split_files(jobs, header, workers, label=f"{category_name} files", manifest=manifest)
+
+
+def link_unit(guid, content, entity_dict):
+    """An entity with links plus copies of its linked GUIDs; these always share a file.
+
+    Missing link targets are skipped; LinkGraph.validate() has already reported them.
+    """
+    new_dict = OrderedDict()
+    new_dict[guid] = content
 
-def split_guids_with_links_from_dict(entity_dict, output_folder, category_name, config_metadata, building_guid, building_content):
+    for linked_guid in content["links"]:
+        if linked_guid not in entity_dict:
+            continue
+        linked_content = entity_dict[linked_guid]
+        copied_content = {k: v for k, v in linked_content.items() if k not in ("operation", "update_mask")}
+        new_dict[linked_guid] = copied_content
+    return new_dict
+
+
+def split_guids_with_links_from_dict(entity_dict, output_folder, category_name, config_metadata, building_guid, building_content,
+                                     workers=1, header=None, manifest=None):
     """Split in-memory dict into files for GUIDs with links."""
     os.makedirs(output_folder, exist_ok=True)
+    if header is None:
+        header = render_header(config_metadata, building_guid, building_content)
     file_counter = 1
+    jobs = []
 
     for guid, content in entity_dict.items():
         if not isinstance(content, dict) or "links" not in content:
             continue
 
-        new_dict = OrderedDict()
-        new_dict["CONFIG_METADATA"] = config_metadata
-        new_dict[building_guid] = building_content
-        new_dict[guid] = content
-
-        for linked_guid in content["links"]:
-            if linked_guid not in entity_dict:
-                print(f"WARNING: Linked GUID {linked_guid} not found in config.")
-                continue
-            linked_content = entity_dict[linked_guid]
-            if "links" in linked_content:
-                print(f"ERROR: Linked GUID {linked_guid} has its own links field. Recursive links not allowed.")
-                sys.exit(1)
-            copied_content = {k: v for k, v in linked_content.items() if k not in ("operation", "update_mask")}
-            new_dict[linked_guid] = copied_content
+        new_dict = link_unit(guid, content, entity_dict)
 
         out_name = f"{category_name}_config_pt{file_counter}.yaml"
         out_path = os.path.join(output_folder, out_name)
-        write_yaml(out_path, new_dict)
+        jobs.append((out_path, new_dict))
         file_counter += 1
 
+    jobs = plan_jobs(jobs, output_folder, category_name, manifest)
+    write_split_files(jobs, header, workers, label=f"{category_name} files", manifest=manifest)
+
+
+def split_guids_packed_from_dict(entity_dict, output_folder, category_name, config_metadata, building_guid, building_content,
+                                budget, use_links, workers=1, header=None, manifest=None, graph=None):
+    """Bin-pack several entities (with their link targets) into each file, up to budget.
+
+    With a link_graph.LinkGraph, entities whose link sets overlap are packed together so each
+    shared link target is sent once per file, and unrelated groups never share a file.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    if header is None:
+        header = render_header(config_metadata, building_guid, building_content)
+
+    units = OrderedDict()
+    for guid, content in entity_dict.items():
+        has_links = isinstance(content, dict) and "links" in content
+        if has_links != use_links:
+            continue
+        unit = link_unit(guid, content, entity_dict) if use_links else OrderedDict([(guid, content)])
+        size = len(render_config(unit).encode("utf-8")) if budget.max_bytes is not None else 0
+        units[guid] = (unit, size, len(content["links"]) if use_links else 0)
+
+    if graph is not None and use_links:
+        link_groups = graph.shared_link_groups(units)
+    else:
+        link_groups = [list(units)]
+    groups = []
+    for link_group in link_groups:
+        groups += batch_packing.pack_units([units[guid] for guid in link_group], budget)
+
+    jobs = []
+    for file_counter, group in enumerate(groups, start=1):
+        new_dict = OrderedDict()
+        for unit in group:
+            new_dict.update(unit)
+        out_name = f"{category_name}_config_pt{file_counter}.yaml"
+        jobs.append((os.path.join(output_folder, out_name), new_dict))
+
+    print(f"Packed {len(units)} {category_name} entities into {len(jobs)} files")
+    jobs = plan_jobs(jobs, output_folder, category_name, manifest)
+    write_split_files(jobs, header, workers, label=f"{category_name} files", manifest=manifest)
+
 
 # ----------------------------
 # Main processing function
 # ----------------------------
-def process_file(input_file):
+def process_file(input_file, workers=None, budget=None, incremental=True, group_links=False):
+    """Split an ABEL export into per-entity config files; workers defaults to the number of CPUs.
+
+    With a batch_packing.PackingBudget, several entities are packed into each file instead.
+    With group_links, virtual entities that share link targets are packed into the same files,
+    capped by budget (or link_graph.DEFAULT_GROUP_BUDGET).
+    With incremental, only files whose content changed since the last run are rewritten
+    (see output_manifest).
+    """
+    workers = workers or os.cpu_count() or 1
     config = None
-    with open(input_file, "r") as f:
-        config = yaml.safe_load(f)
+    with telemetry.span("process.load", file=input_file, bytes=os.path.getsize(input_file)) as record:
+        with open(input_file, "r") as f:
+            config = load_yaml(f)
+        record["guids"] = len(config)
 
     config_metadata = config.get("CONFIG_METADATA", {"operation": "UPDATE"})
     building_guid, building_content = None, None
@@ -194,20 +320,27 @@ def process_file(input_file):
     processing_pool = {k: v for k, v in config.items() if k not in ("CONFIG_METADATA", building_guid)}
 
     # Step 1: Categorize
-    update_reporting, update_virtual, add_virtual, conflicts = categorize_guids(processing_pool)
+    with telemetry.span("process.categorize", file=input_file, guids=len(processing_pool)):
+        update_reporting, update_virtual, add_virtual, conflicts = categorize_guids(processing_pool)
     if conflicts:
         for guid, cats in conflicts:
             print(f"ERROR: GUID {guid} qualifies for multiple categories: {cats}")
         sys.exit(1)
 
-    # Step 2: Expand links for virtual entities
-    expand_links(update_virtual, config)
-    expand_links(add_virtual, config)
-
-    # Step 3: Prepend header
-    update_reporting = prepend_header(update_reporting, config_metadata, building_guid, building_content)
-    update_virtual = prepend_header(update_virtual, config_metadata, building_guid, building_content)
-    add_virtual = prepend_header(add_virtual, config_metadata, building_guid, building_content)
+    # Step 2: Check every link once, before anything is written, then expand links for virtual entities
+    with telemetry.span("process.link_graph", file=input_file) as record:
+        graph = link_graph.LinkGraph.from_config(config, {**update_virtual, **add_virtual})
+        record["guids"] = len(graph.forward)
+        if not graph.validate():
+            sys.exit(1)
+    with telemetry.span("process.expand_links", file=input_file, guids=len(update_virtual) + len(add_virtual)):
+        expand_links(update_virtual, config)
+        expand_links(add_virtual, config)
+
+    # Step 3: Render the shared CONFIG_METADATA + building header once
+    with telemetry.span("process.header", file=input_file) as record:
+        header = render_header(config_metadata, building_guid, building_content)
+        record["bytes"] = len(header)
 
     # Step 4: Lowercase update_mask fields
     lowercase_update_mask(update_reporting)
@@ -216,6 +349,9 @@ def process_file(input_file):
 
     # Step 5: Split directly from dicts
     base_dir = os.path.dirname(input_file)
+    if budget is not None:
+        budget = batch_packing.adapt_budget(budget, base_dir)
+    manifest = output_manifest.OutputManifest(base_dir, header) if incremental else None
     categories = [
         ("update_reporting_entities", update_reporting, False, "update_reporting"),
         ("update_virtual_entities", update_virtual, True, "update_virtual"),
@@ -224,12 +360,168 @@ def process_file(input_file):
 
     for folder_name, content, use_links_split, category_name in categories:
         category_folder = os.path.join(base_dir, folder_name)
-        if use_links_split:
-            split_guids_with_links_from_dict(content, category_folder, category_name,
-                                            config_metadata, building_guid, building_content)
-        else:
-            split_guids_no_links_from_dict(content, category_folder, category_name,
-                                           config_metadata, building_guid, building_content)
+        with telemetry.span("process.split", file=input_file, category=category_name, guids=len(content)):
+            if group_links and use_links_split:
+                split_guids_packed_from_dict(content, category_folder, category_name, config_metadata, building_guid,
+                                             building_content, budget or link_graph.DEFAULT_GROUP_BUDGET, True,
+                                             workers, header, manifest, graph)
+            elif budget is not None:
+                split_guids_packed_from_dict(content, category_folder, category_name, config_metadata, building_guid,
+                                             building_content, budget, use_links_split, workers, header, manifest)
+            elif use_links_split:
+                split_guids_with_links_from_dict(content, category_folder, category_name,
+                                                config_metadata, building_guid, building_content, workers, header, manifest)
+            else:
+                split_guids_no_links_from_dict(content, category_folder, category_name,
+                                               config_metadata, building_guid, building_content, workers, header, manifest)
+
+    if manifest is not None:
+        manifest.remove_stale()
+        manifest.save()
+
+    print("Processing and splitting complete.")
+    print("Split files written to subfolders in:", base_dir)
+
+
+# ----------------------------
+# Streaming processing
+# ----------------------------
+def index_export(f):
+    """First pass over an open (binary) export: categorize every GUID block and keep only its location.
+
+    Returns (config_metadata, building_guid, building_content, index, conflicts) where index maps
+    guid -> (offset, length, category, links) and category is one of the categorize_guids buckets
+    ("update_reporting", "update_virtual", "add_virtual") or None. Only CONFIG_METADATA and the
+    building are fully parsed; other blocks are routed from entity_records.EntityRecord fields.
+    """
+    config_metadata = None
+    building_guid, building_content = None, None
+    index = OrderedDict()
+    conflicts = []
+
+    for offset, length in list(yaml_blocks.iter_top_level_blocks(f)):
+        record = entity_records.EntityRecord.from_block(yaml_blocks.read_raw(f, offset, length))
+        guid = record.guid
+        if guid == "CONFIG_METADATA":
+            config_metadata = yaml_blocks.read_block(f, offset, length)[1]
+            continue
+        if building_guid is None and record.type == "FACILITIES/BUILDING":
+            building_guid, building_content = yaml_blocks.read_block(f, offset, length)
+            continue
+
+        categories = entity_categories(record.has_translation, record.links is not None, record.operation)
+        category = None
+        if len(categories) > 1:
+            conflicts.append((guid, categories))
+        elif categories:
+            category = "update_reporting" if categories[0] == "reporting" else categories[0]
+        index[guid] = (offset, length, category, record.links)
+
+    if config_metadata is None:
+        config_metadata = {"operation": "UPDATE"}
+    return config_metadata, building_guid, building_content, index, conflicts
+
+
+def _parsed_record(raw):
+    guid, content = next(iter(load_yaml(raw.decode("utf-8")).items()))
+    return entity_records.EntityRecord.from_content(guid, content)
+
+
+def _joined_etag(etags, guid, joined):
+    """Etag to write for guid (None leaves the file's own), recorded in joined."""
+    etag = etags.get(guid)
+    if etag is not None:
+        joined[guid] = etag
+    return etag
+
+
+def iter_streaming_files(input_file, verbatim=True, etags=None):
+    """Produce the split files of process_file_streaming one at a time, without writing them.
+
+    Yields (folder_name, file_name, header, body, joined, source_hash, guids) in onboarding order,
+    with header and body as bytes and guids the file's entities, the one it is for first. If etags (GUID -> etag, as from transfer_etags.load_etag_index) is
+    given, every entity and the building get their etag from it, as sync_etags would set them;
+    joined maps each GUID to the etag written. source_hash is a hash of the export text the file
+    was produced from, so it stays the same when only the joined etags change.
+    """
+    etags = etags or {}
+    to_record = entity_records.EntityRecord.from_block if verbatim else _parsed_record
+    with open(input_file, "rb") as f:
+        with telemetry.span("process.index", file=input_file, bytes=os.path.getsize(input_file)) as record:
+            config_metadata, building_guid, building_content, index, conflicts = index_export(f)
+            record["guids"] = len(index)
+        if not building_guid:
+            print("ERROR: No FACILITIES/BUILDING GUID found in input file.")
+            sys.exit(1)
+        if conflicts:
+            for guid, cats in conflicts:
+                print(f"ERROR: GUID {guid} qualifies for multiple categories: {cats}")
+            sys.exit(1)
+        graph = link_graph.LinkGraph.from_index(index, ("update_virtual", "add_virtual"), ("CONFIG_METADATA", building_guid))
+        if not graph.validate():
+            sys.exit(1)
+
+        header = source_header = render_header(config_metadata, building_guid, building_content)
+        building_etag = etags.get(building_guid)
+        if building_etag is not None and isinstance(building_content, dict):
+            header = render_header(config_metadata, building_guid,
+                                   dict(building_content, etag=SingleQuoted(building_etag)))
+        categories = [
+            ("update_reporting_entities", "update_reporting"),
+            ("update_virtual_entities", "update_virtual"),
+            ("add_virtual_entities", "add_virtual"),
+        ]
+
+        for folder_name, category_name in categories:
+            file_counter = 1
+            with telemetry.span("process.split", file=input_file, category=category_name) as record:
+                for guid, (offset, length, category, links) in index.items():
+                    if category != category_name:
+                        continue
+                    joined = {building_guid: building_etag} if building_etag is not None else {}
+                    raw = yaml_blocks.read_raw(f, offset, length)
+                    source = [source_header, raw]
+                    parts = [to_record(raw).render(etag=_joined_etag(etags, guid, joined))]
+
+                    included = [guid]
+                    for linked_guid in links or ():
+                        if linked_guid in included or linked_guid == building_guid or linked_guid not in index:
+                            continue
+                        included.append(linked_guid)
+                        linked_offset, linked_length, _, _ = index[linked_guid]
+                        linked_raw = yaml_blocks.read_raw(f, linked_offset, linked_length)
+                        source.append(linked_raw)
+                        parts.append(to_record(linked_raw).render(link_copy=True,
+                                                                  etag=_joined_etag(etags, linked_guid, joined)))
+
+                    yield (folder_name, f"{category_name}_config_pt{file_counter}.yaml", header, b"".join(parts),
+                           joined, output_manifest.content_hash(b"".join(source)), included)
+                    file_counter += 1
+                record["guids"] = file_counter - 1
+
+
+def process_file_streaming(input_file, verbatim=True):
+    """Low-memory variant of process_file that never loads the whole export.
+
+    Blocks are indexed one at a time, then each output file is produced by seeking back to the
+    entity and its link targets. With verbatim, entities are copied as their source text (only
+    update_mask is lowercased and link copies lose operation/update_mask), which is much faster
+    than re-serializing them; otherwise they are re-rendered and output matches process_file.
+    """
+    base_dir = os.path.dirname(input_file)
+    folders = ("update_reporting_entities", "update_virtual_entities", "add_virtual_entities")
+    created = set()
+    written = {}
+    for folder_name, out_name, header, body, _, _, guids in iter_streaming_files(input_file, verbatim):
+        if folder_name not in created:
+            os.makedirs(os.path.join(base_dir, folder_name), exist_ok=True)
+            created.add(folder_name)
+        out_path = os.path.join(base_dir, folder_name, out_name)
+        written[out_path] = (write_rendered_file(out_path, header, body)[0], guids)
+    # Categories without entities still get their (empty) folder
+    for folder_name in folders:
+        os.makedirs(os.path.join(base_dir, folder_name), exist_ok=True)
+    output_manifest.record_rewritten(base_dir, written)
 
     print("Processing and splitting complete.")
     print("Split files written to subfolders in:", base_dir)
@@ -239,11 +531,19 @@ def process_file(input_file):
 # Entry point
 # ----------------------------
 if __name__ == "__main__":
+    profiling.install("process_ABEL_output")
     input_file = input("Enter the absolute path to the yaml file exported by ABEL: ").strip()
     if not os.path.isfile(input_file):
         print(f"ERROR: File not found: {input_file}")
         sys.exit(1)
-    process_file(input_file)
+    streaming = input("Use low-memory streaming mode (recommended for very large exports)? Y/N: ").strip().lower() == "y"
+    if streaming:
+        process_file_streaming(input_file)
+    else:
+        max_entities = input("Maximum entities per file (blank for one per file): ").strip()
+        budget = batch_packing.PackingBudget(int(max_entities)) if max_entities else None
+        group_links = input("Group virtual entities that share linked devices into the same files? Y/N: ").strip().lower() == "y"
+        process_file(input_file, budget=budget, group_links=group_links)
 
 
 
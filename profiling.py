@@ -0,0 +1,228 @@
+"""Opt-in cProfile and tracemalloc profiling for the entry-point scripts.
+
+Set ABEL_PROFILE_DIR to a directory and run a script as usual:
+
+    ABEL_PROFILE_DIR=/tmp/abel_profiles python3 process_ABEL_output.py
+
+On exit the script writes two files named <script>-<timestamp>-<pid>:
+    .pstats   cProfile data for the main thread plus every thread started
+              while profiling (open with `python3 -m pstats` or snakeviz); from
+              Python 3.12 one profiler covers all threads, before that each
+              new thread gets its own
+    .txt      the slowest functions by cumulative time; every telemetry span
+              on the main thread with its duration, peak traced memory and the
+              allocation sites that grew most during it; and the spans of other
+              threads (onboard_file, sync_etags, ... in the onboarding pool),
+              grouped by name
+
+tracemalloc can't tell threads apart, so the figures for worker-thread spans
+are process-wide: the peak is traced memory sampled every SAMPLE_INTERVAL
+seconds while a span was open, and the allocation sites come from the first
+outermost span of each name and include whatever other threads allocated
+meanwhile.
+
+Without ABEL_PROFILE_DIR, install() returns straight away and telemetry spans
+don't call into this module. Worker processes (process_ABEL_output's parallel
+writer, batch_runner) are not profiled.
+"""
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import telemetry
+
+PROFILE_DIR_ENV = "ABEL_PROFILE_DIR"
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 10
+SAMPLE_INTERVAL = 0.005
+
+_lock = threading.Lock()
+_profilers = []
+_phases = []
+_phase_stack = []
+_main_profiler = None
+# Spans on threads other than the main one: finished, still open (for the sampler),
+# names that already had their allocation sample, and each thread's stack of open spans
+_worker_phases = []
+_open_worker_phases = []
+_sampled_names = set()
+_worker_stacks = threading.local()
+_stop_sampler = threading.Event()
+# The profiler's own snapshot bookkeeping is left out of the allocation reports
+_OWN_FILES = (tracemalloc.__file__, __file__)
+
+
+def _start_thread_profiler(*_):
+    """threading.setprofile hook: swap itself for a cProfile profiler on the new thread's first event."""
+    sys.setprofile(None)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active; the thread still runs, just unprofiled
+        return
+    with _lock:
+        _profilers.append(profiler)
+
+
+def _phase_hook(name):
+    """telemetry span hook: track peak memory of main-thread spans, and allocation growth of outermost ones.
+
+    Snapshots cost time proportional to the live heap, so nested spans only get a peak.
+    Spans on other threads are handed to _worker_phase_hook.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return _worker_phase_hook(name)
+    # Snapshots are slow; keep them out of the cProfile data
+    _main_profiler.disable()
+    # A nested span resets the peak, so fold the parent's peak so far into its own record first
+    current, peak = tracemalloc.get_traced_memory()
+    if _phase_stack:
+        _phase_stack[-1]["peak"] = max(_phase_stack[-1]["peak"], peak)
+    tracemalloc.reset_peak()
+    phase = {"name": name, "peak": current, "allocations": [],
+             "snapshot": None if _phase_stack else tracemalloc.take_snapshot()}
+    _phase_stack.append(phase)
+    phase["start"] = time.perf_counter()
+    _main_profiler.enable()
+
+    def finish():
+        _main_profiler.disable()
+        phase["duration"] = time.perf_counter() - phase["start"]
+        phase["peak"] = max(phase["peak"], tracemalloc.get_traced_memory()[1])
+        _phase_stack.pop()
+        snapshot = phase.pop("snapshot")
+        if snapshot is not None:
+            stats = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+            phase["allocations"] = [stat for stat in stats if stat.size_diff > 0
+                                    and stat.traceback[0].filename not in _OWN_FILES][:TOP_ALLOCATIONS]
+        if _phase_stack:
+            _phase_stack[-1]["peak"] = max(_phase_stack[-1]["peak"], phase["peak"])
+        _phases.append(phase)
+        _main_profiler.enable()
+
+    return finish
+
+
+def _worker_phase_hook(name):
+    """Record a span on another thread; the first outermost span of each name also gets an allocation snapshot."""
+    stack = getattr(_worker_stacks, "stack", None)
+    if stack is None:
+        stack = _worker_stacks.stack = []
+    phase = {"name": name, "peak": tracemalloc.get_traced_memory()[0], "allocations": [], "snapshot": None}
+    with _lock:
+        take_snapshot = not stack and name not in _sampled_names
+        if take_snapshot:
+            _sampled_names.add(name)
+        _open_worker_phases.append(phase)
+    if take_snapshot:
+        phase["snapshot"] = tracemalloc.take_snapshot()
+    stack.append(phase)
+    phase["start"] = time.perf_counter()
+
+    def finish():
+        phase["duration"] = time.perf_counter() - phase["start"]
+        stack.pop()
+        with _lock:
+            _open_worker_phases.remove(phase)
+        phase["peak"] = max(phase["peak"], tracemalloc.get_traced_memory()[0])
+        snapshot = phase.pop("snapshot")
+        if snapshot is not None:
+            stats = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+            phase["allocations"] = [stat for stat in stats if stat.size_diff > 0
+                                    and stat.traceback[0].filename not in _OWN_FILES][:TOP_ALLOCATIONS]
+        with _lock:
+            _worker_phases.append(phase)
+
+    return finish
+
+
+def _sample_worker_peaks():
+    """Fold traced memory into the peak of every open worker-thread span until profiling stops."""
+    while not _stop_sampler.wait(SAMPLE_INTERVAL):
+        current = tracemalloc.get_traced_memory()[0]
+        with _lock:
+            for phase in _open_worker_phases:
+                if current > phase["peak"]:
+                    phase["peak"] = current
+
+
+def install(script_name):
+    """Start profiling this process if ABEL_PROFILE_DIR is set; results are written at exit."""
+    profile_dir = os.environ.get(PROFILE_DIR_ENV)
+    if not profile_dir:
+        return
+    os.makedirs(profile_dir, exist_ok=True)
+    base_path = os.path.join(profile_dir, f"{script_name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+
+    global _main_profiler
+    _main_profiler = cProfile.Profile()
+    _profilers.append(_main_profiler)
+    tracemalloc.start()
+    # Started before the per-thread profiler hook so the sampler itself isn't profiled before 3.12
+    threading.Thread(target=_sample_worker_peaks, name="profiling-sampler", daemon=True).start()
+    telemetry.add_span_hook(_phase_hook)
+    # From 3.12 cProfile sees every thread and only one profiler may be active at a time
+    if sys.version_info < (3, 12):
+        threading.setprofile(_start_thread_profiler)
+    atexit.register(_write_results, base_path)
+    print(f"Profiling to {base_path}.*")
+    _main_profiler.enable()
+
+
+def _write_results(base_path):
+    main_profiler = _main_profiler
+    main_profiler.disable()
+    _stop_sampler.set()
+    if sys.version_info < (3, 12):
+        threading.setprofile(None)
+    telemetry.remove_span_hook(_phase_hook)
+    with _lock:
+        profilers = list(_profilers)
+    stats = pstats.Stats(main_profiler)
+    for profiler in profilers:
+        if profiler is not main_profiler:
+            profiler.disable()
+            stats.add(profiler)
+    stats.dump_stats(base_path + ".pstats")
+
+    report = io.StringIO()
+    stats.stream = report
+    report.write(f"Top {TOP_FUNCTIONS} functions by cumulative time ({len(profilers)} profiler(s))\n")
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    report.write("\nPhases (main-thread telemetry spans, in the order they finished)\n")
+    for phase in _phases:
+        report.write(f"\n{phase['name']}: {phase['duration']:.3f}s, peak {phase['peak'] / 2**20:.1f} MiB traced\n")
+        _write_allocations(report, phase["allocations"])
+
+    with _lock:
+        worker_phases = list(_worker_phases)
+    if worker_phases:
+        report.write("\nWorker-thread spans, by name (memory is process-wide: tracemalloc can't tell threads apart;\n"
+                     f"peaks are sampled every {SAMPLE_INTERVAL * 1000:.0f} ms, allocation sites come from the first "
+                     "outermost span of each name and include other threads' allocations during it)\n")
+        by_name = {}
+        for phase in worker_phases:
+            by_name.setdefault(phase["name"], []).append(phase)
+        for name, phases in sorted(by_name.items(), key=lambda item: -sum(p["duration"] for p in item[1])):
+            durations = [phase["duration"] for phase in phases]
+            report.write(f"\n{name}: {len(phases)} span(s), {sum(durations):.3f}s total, "
+                         f"p50 {telemetry.percentile(durations, 0.5):.3f}s, max {max(durations):.3f}s, "
+                         f"peak {max(phase['peak'] for phase in phases) / 2**20:.1f} MiB traced\n")
+            _write_allocations(report, next((phase["allocations"] for phase in phases if phase["allocations"]), []))
+    tracemalloc.stop()
+    with open(base_path + ".txt", "w") as f:
+        f.write(report.getvalue())
+    print(f"Profile written to {base_path}.pstats and {base_path}.txt")
+
+
+def _write_allocations(report, allocations):
+    for stat in allocations:
+        frame = stat.traceback[0]
+        report.write(f"    +{stat.size_diff / 1024:10.1f} KiB  {stat.count_diff:+8d} blocks  "
+                     f"{frame.filename}:{frame.lineno}\n")
@@ -0,0 +1,193 @@
+"""Embedded run-state store for onboarding (results/run_state.sqlite).
+
+One row per config file records its content hash, the operation it was
+submitted as, its status, timestamps, attempt count and error text. Skip
+checks and the summary are indexed queries, and a row left in the
+"running" state by an interrupted run lets the next run resume polling the
+same operation instead of submitting the file again. The size of every file
+that timed out is kept as well, so batch_packing can shrink later budgets.
+"""
+import os
+import sqlite3
+import threading
+import time
+import output_manifest
+
+DB_NAME = "run_state.sqlite"
+SUCCESS_MARKER = "Successfully completed onboard operation."
+
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS onboarding (
+    config_path    TEXT PRIMARY KEY,
+    content_hash   TEXT,
+    operation_name TEXT,
+    status         TEXT NOT NULL,
+    started_at     REAL,
+    finished_at    REAL,
+    attempts       INTEGER NOT NULL DEFAULT 0,
+    error          TEXT
+);
+CREATE INDEX IF NOT EXISTS onboarding_hash_status ON onboarding (content_hash, status);
+CREATE TABLE IF NOT EXISTS timeouts (
+    config_path TEXT PRIMARY KEY,
+    entities    INTEGER NOT NULL,
+    body_bytes  INTEGER NOT NULL,
+    recorded_at REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(results_root):
+    """Shared store for a results folder, created (and seeded from existing results) on first use."""
+    results_root = os.path.abspath(results_root)
+    with _stores_lock:
+        store = _stores.get(results_root)
+        if store is None:
+            store = RunStateStore(os.path.join(results_root, DB_NAME))
+            store.import_results_folder(results_root)
+            _stores[results_root] = store
+        return store
+
+
+class RunStateStore:
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ----------------------------
+    # Lookups
+    # ----------------------------
+    def get(self, config_path):
+        """Row for a config file as a dict, or None."""
+        rows = self._query("SELECT config_path, content_hash, operation_name, status, started_at, finished_at, "
+                           "attempts, error FROM onboarding WHERE config_path = ?", (os.path.abspath(config_path),))
+        if not rows:
+            return None
+        keys = ("config_path", "content_hash", "operation_name", "status", "started_at", "finished_at",
+                "attempts", "error")
+        return dict(zip(keys, rows[0]))
+
+    def is_completed(self, config_path, content_hash=None):
+        """True if this content (or, without a hash, this file) was already onboarded successfully."""
+        if content_hash is not None:
+            rows = self._query("SELECT 1 FROM onboarding WHERE content_hash = ? AND status = ? LIMIT 1",
+                               (content_hash, SUCCEEDED))
+        else:
+            rows = self._query("SELECT 1 FROM onboarding WHERE config_path = ? AND status = ?",
+                               (os.path.abspath(config_path), SUCCEEDED))
+        return bool(rows)
+
+    def resumable_operation(self, config_path, content_hash=None):
+        """Operation name of an interrupted submission of the same content, if any."""
+        row = self.get(config_path)
+        if row and row["status"] == RUNNING and row["operation_name"] and row["content_hash"] == content_hash:
+            return row["operation_name"]
+        return None
+
+    def statuses(self, config_paths):
+        """Map absolute config path -> row dict for the given files."""
+        wanted = [os.path.abspath(p) for p in config_paths]
+        found = {}
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start:start + 500]
+            rows = self._query(
+                "SELECT config_path, status, started_at, finished_at, attempts, error FROM onboarding "
+                f"WHERE config_path IN ({','.join('?' * len(chunk))})", chunk)
+            for path, status, started_at, finished_at, attempts, error in rows:
+                found[path] = {"status": status, "started_at": started_at, "finished_at": finished_at,
+                               "attempts": attempts, "error": error}
+        return found
+
+    def timeouts(self):
+        """(config_path, entities, body_bytes) of every file recorded as having timed out."""
+        return self._query("SELECT config_path, entities, body_bytes FROM timeouts ORDER BY config_path")
+
+    # ----------------------------
+    # Updates
+    # ----------------------------
+    def mark_started(self, config_path, content_hash=None):
+        self._execute(
+            "INSERT INTO onboarding (config_path, content_hash, status, started_at, attempts) VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT(config_path) DO UPDATE SET content_hash = excluded.content_hash, status = excluded.status, "
+            "started_at = excluded.started_at, finished_at = NULL, operation_name = NULL, error = NULL, "
+            "attempts = attempts + 1",
+            (os.path.abspath(config_path), content_hash, RUNNING, time.time()))
+
+    def set_operation(self, config_path, operation_name):
+        self._execute("UPDATE onboarding SET operation_name = ? WHERE config_path = ?",
+                      (operation_name, os.path.abspath(config_path)))
+
+    def mark_finished(self, config_path, succeeded, error=None):
+        self._execute("UPDATE onboarding SET status = ?, finished_at = ?, error = ? WHERE config_path = ?",
+                      (SUCCEEDED if succeeded else FAILED, time.time(), error, os.path.abspath(config_path)))
+
+    def record_timeout(self, config_path, entities, body_bytes):
+        """Keep the shape of a file that timed out; it outlives the file being repacked or onboarded later."""
+        self._execute("INSERT OR REPLACE INTO timeouts (config_path, entities, body_bytes, recorded_at) "
+                      "VALUES (?, ?, ?, ?)", (os.path.abspath(config_path), entities, body_bytes, time.time()))
+
+    # ----------------------------
+    # One-time import of result files
+    # ----------------------------
+    def import_results_folder(self, results_root):
+        """Seed the store from result files written before it existed. Runs once per store."""
+        if self._query("SELECT 1 FROM meta WHERE key = 'results_imported'"):
+            return
+
+        imported = 0
+        base_dir = os.path.dirname(results_root)
+        if os.path.isdir(results_root):
+            for result_subdir in sorted(os.listdir(results_root)):
+                result_dir = os.path.join(results_root, result_subdir)
+                if not os.path.isdir(result_dir) or not result_subdir.endswith("_results"):
+                    continue
+                config_dir = os.path.join(base_dir, result_subdir[:-len("_results")] + "_entities")
+                for result_name in sorted(os.listdir(result_dir)):
+                    base, ext = os.path.splitext(result_name)
+                    if not base.endswith("_result"):
+                        continue
+                    result_path = os.path.join(result_dir, result_name)
+                    config_path = os.path.join(config_dir, base[:-len("_result")] + ext)
+                    try:
+                        with open(result_path, "r", encoding="utf-8", errors="ignore") as fh:
+                            content = fh.read()
+                    except OSError:
+                        continue
+                    succeeded = SUCCESS_MARKER in content
+                    finished_at = os.path.getmtime(result_path)
+                    self._execute(
+                        "INSERT OR IGNORE INTO onboarding (config_path, content_hash, status, finished_at, attempts, "
+                        "error) VALUES (?, ?, ?, ?, 1, ?)",
+                        (os.path.abspath(config_path), output_manifest.lookup_content_hash(config_path),
+                         SUCCEEDED if succeeded else FAILED, finished_at,
+                         None if succeeded else content.strip()[-500:]))
+                    imported += 1
+        self._execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('results_imported', ?)", (str(time.time()),))
+        if imported:
+            print(f"Imported {imported} existing result file(s) into {self.db_path}")
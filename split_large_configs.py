@@ -1,79 +1,97 @@
+import mmap
 import os
+import re
+import profiling
 
-def split_config_file(input_file):
-    with open(input_file, "r") as f:
-        lines = f.readlines()
+# A top-level key line: doesn't start with a space and ends (ignoring whitespace) with ':'
+KEY_LINE = re.compile(rb"^(?! )[^\n]*:[ \t\r\f\v]*$", re.M)
+UPDATE_LINE = re.compile(rb"^[ \t\r\f\v]*operation: UPDATE[^\n]*\n?", re.M)
+FACILITY_MARKER = b"type: FACILITIES/BUILDING"
 
-    # Detect CONFIG_METADATA (always at the top)
-    config_metadata = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        config_metadata.append(line)
-        if line.strip().startswith("operation: UPDATE"):
-            i += 1
-            break
-        i += 1
 
-    # Detect the FACILITIES/BUILDING block
-    facility_block = []
-    current_block = []
-    facility_found = False
+def index_config(buffer):
+    """Scan a config (bytes or mmap) once and return the byte ranges to split it by.
+
+    Returns (header_ranges, block_ranges) as lists of (start, end). The header is CONFIG_METADATA
+    up to and including its "operation: UPDATE" line, followed by the FACILITIES/BUILDING block;
+    block_ranges are the top-level GUID blocks after the building. Blocks between the metadata
+    and the building are not part of any output.
+    """
+    size = len(buffer)
+    match = UPDATE_LINE.search(buffer)
+    if match is None:
+        raise ValueError("FACILITIES/BUILDING block not found in YAML file.")
+    metadata_end = match.end()
 
-    while i < len(lines):
-        line = lines[i]
-        if not line.startswith(" ") and line.strip().endswith(":"):
-            if current_block:
-                if any("type: FACILITIES/BUILDING" in l for l in current_block):
-                    facility_block = current_block[:]
-                    facility_found = True
-                    break
-            current_block = [line]
-        else:
-            current_block.append(line)
-        i += 1
+    starts = [m.start() for m in KEY_LINE.finditer(buffer, metadata_end)]
+    # Anything between the metadata and the first key line counts as a block of its own
+    if not starts or starts[0] != metadata_end:
+        starts.insert(0, metadata_end)
 
-    if not facility_found:
+    # The building block is only recognised once another top-level key follows it
+    for k in range(len(starts) - 1):
+        if buffer.find(FACILITY_MARKER, starts[k], starts[k + 1]) != -1:
+            facility = (starts[k], starts[k + 1])
+            break
+    else:
         raise ValueError("FACILITIES/BUILDING block not found in YAML file.")
 
-    # Prepare header for every file
-    header = config_metadata + facility_block
+    block_starts = starts[k + 1:]
+    block_ranges = list(zip(block_starts, block_starts[1:] + [size]))
+    return [(0, metadata_end), facility], block_ranges
+
 
-    # Collect all GUID blocks
-    guid_blocks = []
-    current_block = []
+def _write_ranges(path, view, ranges):
+    """Write byte ranges of view to path without copying them into Python objects."""
+    slices = [view[start:end] for start, end in ranges]
+    buffers = list(slices)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while buffers:
+            written = os.writev(fd, buffers)
+            # writev may stop short; drop what was written and retry with the rest
+            while buffers and written >= len(buffers[0]):
+                written -= len(buffers[0])
+                buffers.pop(0)
+            if buffers and written:
+                buffers[0] = buffers[0][written:]
+                slices.append(buffers[0])
+    finally:
+        os.close(fd)
+        for buf in slices:
+            buf.release()
 
-    while i < len(lines):
-        line = lines[i]
-        if not line.startswith(" ") and line.strip().endswith(":"):
-            if current_block:
-                guid_blocks.append(current_block)
-            current_block = [line]
-        else:
-            current_block.append(line)
-        i += 1
-    if current_block:
-        guid_blocks.append(current_block)
 
-    # Directory for outputs
+def split_config_file(input_file, entities_per_file=1):
+    """Split a config into parts of entities_per_file GUID blocks, each behind the shared header."""
     output_dir = os.path.dirname(input_file)
     base_name = os.path.splitext(os.path.basename(input_file))[0]
 
-    # Write each GUID block into its own file
-    part_num = 1
-    for block in guid_blocks:
-        output_file = os.path.join(output_dir, f"{base_name}_pt{part_num}.yaml")
-        with open(output_file, "w") as f:
-            f.writelines(header + block)
-        print(f"Wrote {output_file} with {len(header) + len(block)} lines")
-        part_num += 1
+    with open(input_file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("FACILITIES/BUILDING block not found in YAML file.")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            header_ranges, block_ranges = index_config(mm)
+            header_size = sum(end - start for start, end in header_ranges)
+
+            part_num = 1
+            for i in range(0, len(block_ranges), entities_per_file):
+                group = block_ranges[i:i + entities_per_file]
+                # Consecutive blocks are contiguous in the file, so a part is a single range
+                body = (group[0][0], group[-1][1])
+                output_file = os.path.join(output_dir, f"{base_name}_pt{part_num}.yaml")
+                _write_ranges(output_file, view, header_ranges + [body])
+                print(f"Wrote {output_file} with {len(group)} entities ({header_size + body[1] - body[0]} bytes)")
+                part_num += 1
 
 
 if __name__ == "__main__":
+    profiling.install("split_large_configs")
     input_file = input("Enter the absolute path to the original config file: ").strip()
     if not os.path.isabs(input_file):
         print("❌ Please provide an absolute path.")
     elif not os.path.exists(input_file):
         print("❌ File not found at that path.")
     else:
-        split_config_file(input_file)
\ No newline at end of file
+        entities_input = input("How many entities per output file? [1]: ").strip()
+        split_config_file(input_file, int(entities_input) if entities_input else 1)
@@ -0,0 +1,41 @@
+"""Single place where the scripts shell out to the stubby CLI.
+
+The executable can be swapped through the ABEL_STUBBY environment variable
+(e.g. ABEL_STUBBY="python3 fake_stubby.py" for offline runs); it defaults to
+`stubby` on the PATH. Calls are counted per RPC method so benchmarks can
+report how many OnboardBuilding/GetOperation calls a run needed, and each
+call is recorded as a "stubby.<Method>" telemetry span.
+"""
+import os
+import shlex
+import subprocess
+import threading
+import telemetry
+from collections import Counter
+
+STUBBY_ENV = "ABEL_STUBBY"
+
+call_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def stubby_command():
+    return shlex.split(os.environ.get(STUBBY_ENV, "stubby"))
+
+
+def run_stubby(args):
+    """Run a stubby argument list (whose first element is "stubby") and capture its output."""
+    method = args[3].rsplit(".", 1)[-1] if len(args) > 3 else "unknown"
+    with _counts_lock:
+        call_counts[method] += 1
+    with telemetry.span("stubby." + method) as record:
+        result = subprocess.run(stubby_command() + list(args[1:]), capture_output=True, text=True)
+        record["returncode"] = result.returncode
+        if result.returncode != 0:
+            record["outcome"] = "failed"
+    return result
+
+
+def reset_counts():
+    with _counts_lock:
+        call_counts.clear()
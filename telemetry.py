@@ -0,0 +1,90 @@
+"""Structured timing spans for processing and onboarding.
+
+    with telemetry.span("sync_etags", file=path) as record:
+        ...
+        record["guids"] = count
+
+Every span is aggregated in memory (see summary()). If the ABEL_TELEMETRY
+environment variable names a file, each finished span is also appended to it
+as one JSON line with its name, start time, duration, outcome and any fields
+the caller attached (file, GUID count, bytes, attempt, ...).
+
+Span hooks (see add_span_hook) let profiling.py follow the same phases; with
+no hooks registered a span only checks an empty list.
+"""
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TELEMETRY_ENV = "ABEL_TELEMETRY"
+
+_lock = threading.Lock()
+_totals = {}
+_span_hooks = []
+
+
+def _emit(record):
+    path = os.environ.get(TELEMETRY_ENV)
+    if not path:
+        return
+    line = json.dumps(record, default=str)
+    with _lock:
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def span(name, **fields):
+    """Time a block; fields added to the yielded dict are included in the emitted record."""
+    record = dict(fields)
+    finishers = [finish for finish in (hook(name) for hook in _span_hooks) if finish] if _span_hooks else ()
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record.setdefault("outcome", "error")
+        record.setdefault("error", repr(e))
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        for finish in reversed(finishers):
+            finish()
+        record.setdefault("outcome", "ok")
+        with _lock:
+            count, total = _totals.get(name, (0, 0.0))
+            _totals[name] = (count + 1, total + duration)
+        _emit({"span": name, "start": round(started, 6), "duration": round(duration, 6),
+               "thread": threading.current_thread().name, **record})
+
+
+def add_span_hook(hook):
+    """Call hook(name) as every span starts; it may return a callable to run when the span ends."""
+    _span_hooks.append(hook)
+
+
+def remove_span_hook(hook):
+    if hook in _span_hooks:
+        _span_hooks.remove(hook)
+
+
+def summary():
+    """Map span name -> (count, total seconds) for every span finished in this process."""
+    with _lock:
+        return dict(_totals)
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    # Rounded first so float error (0.07 * 100 == 7.000000000000001) doesn't push the rank up by one
+    index = max(0, min(len(ordered) - 1, math.ceil(round(fraction * len(ordered), 9)) - 1))
+    return ordered[index]
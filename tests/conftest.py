@@ -0,0 +1,41 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import execute_API_calls_series  # noqa: E402
+import export_building_config  # noqa: E402
+import operation_poller  # noqa: E402
+import stubby_transport  # noqa: E402
+
+FAST_POLL = operation_poller.PollPolicy(initial_delay=0.02, min_delay=0.02, max_delay=0.05, jitter=0, deadline=30)
+
+
+@pytest.fixture
+def fake_stubby(tmp_path, monkeypatch):
+    """Point stubby at fake_stubby.py with instant calls; returns a function that sets its config."""
+    def configure(**config):
+        settings = {"call_latency": [0, 0], "running_seconds": [0, 0]}
+        settings.update(config)
+        monkeypatch.setenv("FAKE_STUBBY_CONFIG", json.dumps(settings))
+
+    monkeypatch.setenv(stubby_transport.STUBBY_ENV, f"{sys.executable} {os.path.join(ROOT, 'fake_stubby.py')}")
+    monkeypatch.setenv("FAKE_STUBBY_STATE", str(tmp_path / "fake_stubby_state"))
+    monkeypatch.setattr(execute_API_calls_series, "ONBOARD_POLL_POLICY", FAST_POLL)
+    monkeypatch.setattr(export_building_config, "EXPORT_POLL_POLICY", FAST_POLL)
+    configure()
+    return configure
+
+
+def split_files(base_dir):
+    """Split config files under base_dir in onboarding order."""
+    files = []
+    for folder in ("update_reporting_entities", "update_virtual_entities", "add_virtual_entities"):
+        folder_path = os.path.join(base_dir, folder)
+        if os.path.isdir(folder_path):
+            files += sorted(os.path.join(folder_path, name) for name in os.listdir(folder_path))
+    return files
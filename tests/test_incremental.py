@@ -0,0 +1,48 @@
+import os
+import shutil
+
+import execute_API_calls_series
+import generate_synthetic_export
+import output_manifest
+import process_ABEL_output
+
+from conftest import split_files
+
+
+def onboard(base_dir, building_config):
+    result_files = execute_API_calls_series.onboard_config_files(
+        "US-BNC-SYN", split_files(base_dir), building_config, preflight_workers=1)
+    return {os.path.basename(cfg): skipped for _, cfg, skipped in result_files}
+
+
+def test_streaming_rewrite_is_onboarded_again(tmp_path, fake_stubby):
+    export = str(tmp_path / "abel_export.yaml")
+    generate_synthetic_export.write_export(export, reporting=3, virtual=0)
+    building_config = str(tmp_path / "building_config.yaml")
+    shutil.copy(export, building_config)
+
+    process_ABEL_output.process_file(export, workers=1)
+    assert not any(onboard(str(tmp_path), building_config).values())
+
+    with open(export) as f:
+        text = f.read()
+    with open(export, "w") as f:
+        f.write(text.replace("code: DEV-1\n", "code: DEV-1-edited\n"))
+    process_ABEL_output.process_file_streaming(export)
+
+    edited = [os.path.basename(path) for path in split_files(str(tmp_path)) if "DEV-1-edited" in open(path).read()]
+    assert len(edited) == 1
+    skipped = onboard(str(tmp_path), building_config)
+    assert skipped[edited[0]] is False
+
+
+def test_unchanged_rerun_keeps_files_and_skips_onboarding(tmp_path, fake_stubby):
+    export = str(tmp_path / "abel_export.yaml")
+    generate_synthetic_export.write_export(export, reporting=3, virtual=1)
+    process_ABEL_output.process_file(export, workers=1)
+    assert not any(onboard(str(tmp_path), export).values())
+
+    hashes = {path: output_manifest.lookup_content_hash(path) for path in split_files(str(tmp_path))}
+    process_ABEL_output.process_file(export, workers=1)
+    assert {path: output_manifest.lookup_content_hash(path) for path in split_files(str(tmp_path))} == hashes
+    assert all(onboard(str(tmp_path), export).values())
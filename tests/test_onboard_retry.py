@@ -0,0 +1,90 @@
+import shutil
+import time
+
+import pytest
+
+import execute_API_calls_series
+import generate_synthetic_export
+import onboard_retry
+import process_ABEL_output
+import run_state
+
+from conftest import split_files
+
+NO_WAIT = onboard_retry.RetryPolicy(max_retries=1, base_delay=0, jitter=0)
+
+
+@pytest.mark.parametrize("text, submitted, kind", [
+    ("error { code: 4 message: \"DEADLINE_EXCEEDED: onboard operation timed out\" }", True, onboard_retry.TIMEOUT),
+    ("error { code: 3 message: \"INVALID_ARGUMENT: entity validation failed\" }", True, onboard_retry.VALIDATION),
+    ("error { code: 10 message: \"ABORTED: etag mismatch for entity\" }", True, onboard_retry.STALE_ETAG),
+    ("FAILED_PRECONDITION: etag of entity is outdated", True, onboard_retry.STALE_ETAG),
+    ("UNAVAILABLE: backend unavailable", True, onboard_retry.TRANSIENT),
+    ("done: true\nerror { code: 13 }", True, onboard_retry.UNKNOWN),
+    ("INVALID_ARGUMENT: entity validation failed", False, onboard_retry.TRANSIENT),
+])
+def test_classify_failure(text, submitted, kind):
+    assert onboard_retry.classify_failure(text, submitted) == kind
+
+
+def test_circuit_breaker_opens_then_half_opens():
+    breaker = onboard_retry.CircuitBreaker(window=4, failure_threshold=0.5, min_outcomes=3, cooldown=0.2)
+    # Closed: too few outcomes to judge, and validation failures say nothing about the backend
+    breaker.record(None)
+    breaker.record(onboard_retry.TIMEOUT)
+    breaker.record(onboard_retry.VALIDATION)
+    assert breaker.trips == 0
+    start = time.monotonic()
+    breaker.wait()
+    assert time.monotonic() - start < 0.1
+
+    # Open: half of the last outcomes were backend failures, so submissions wait out the cooldown
+    breaker.record(onboard_retry.TRANSIENT)
+    assert breaker.trips == 1
+    start = time.monotonic()
+    breaker.wait()
+    assert time.monotonic() - start >= 0.15
+
+    # Half-open: the window was cleared, so one more failure doesn't trip it again...
+    breaker.record(onboard_retry.TIMEOUT)
+    breaker.record(None)
+    assert breaker.trips == 1
+    # ...but the next outcomes decide whether it does
+    breaker.record(onboard_retry.TIMEOUT)
+    assert breaker.trips == 2
+
+
+def onboard_synthetic(tmp_path, breaker=None):
+    """Split a three-device export and onboard it; returns the run_state rows of its files."""
+    export = str(tmp_path / "abel_export.yaml")
+    generate_synthetic_export.write_export(export, reporting=3, virtual=0)
+    building_config = str(tmp_path / "building_config.yaml")
+    shutil.copy(export, building_config)
+    process_ABEL_output.process_file(export, workers=1)
+    files = split_files(str(tmp_path))
+    execute_API_calls_series.onboard_config_files(
+        "US-BNC-SYN", files, building_config, retry_policy=NO_WAIT,
+        breaker=breaker or onboard_retry.CircuitBreaker(cooldown=0), preflight_workers=1)
+    return list(run_state.open_store(str(tmp_path / "results")).statuses(files).values())
+
+
+@pytest.mark.parametrize("rate, kind, attempts", [
+    ("timeout_rate", onboard_retry.TIMEOUT, 2),
+    ("stale_etag_rate", onboard_retry.STALE_ETAG, 2),
+    ("failure_rate", onboard_retry.VALIDATION, 1),
+])
+def test_failures_are_classified_and_retried(tmp_path, fake_stubby, rate, kind, attempts):
+    fake_stubby(**{rate: 1.0, "export_source": str(tmp_path / "building_config.yaml")})
+    rows = onboard_synthetic(tmp_path)
+    assert len(rows) == 3
+    for row in rows:
+        assert row["status"] == run_state.FAILED
+        assert row["error"].startswith(f"{kind}: ")
+        assert row["attempts"] == attempts
+
+
+def test_timeouts_trip_the_breaker(tmp_path, fake_stubby):
+    fake_stubby(timeout_rate=1.0)
+    breaker = onboard_retry.CircuitBreaker(min_outcomes=2, cooldown=0.05)
+    onboard_synthetic(tmp_path, breaker)
+    assert breaker.trips >= 1
@@ -0,0 +1,65 @@
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import execute_API_calls_series
+import generate_synthetic_export
+import onboard_retry
+import onboard_scheduler
+import process_ABEL_output
+import run_state
+
+from conftest import split_files
+
+
+def test_jobs_sharing_a_guid_never_overlap():
+    spans = {}
+    lock = threading.Lock()
+
+    def job(key):
+        start = time.monotonic()
+        time.sleep(0.1)
+        with lock:
+            spans[key] = (start, time.monotonic())
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        scheduler = onboard_scheduler.DependencyScheduler(executor, job)
+        for key, guids in [("a", ["g1", "g2"]), ("b", ["g3"]), ("c", ["g2"]), ("d", ["g4"]), ("e", ["g1", "g3"])]:
+            scheduler.add(key, guids, key)
+        finished = scheduler.wait()
+
+    assert sorted(finished) == ["a", "b", "c", "d", "e"]
+
+    def overlap(first, second):
+        return spans[first][0] < spans[second][1] and spans[second][0] < spans[first][1]
+
+    # c shares g2 with a; e shares g1 with a and g3 with b
+    assert not overlap("a", "c")
+    assert not overlap("a", "e")
+    assert not overlap("b", "e")
+    # Unrelated files still run side by side
+    assert overlap("a", "b")
+    assert overlap("a", "d")
+    assert scheduler.held == 2
+    assert scheduler.depth == {"a": 1, "b": 1, "c": 2, "d": 1, "e": 2}
+
+
+def test_parallel_onboarding_never_sends_stale_etags(tmp_path, fake_stubby):
+    # Virtual-entity files carry copies of the devices they link to, so most files share GUIDs
+    # with others; fake_stubby rejects any onboard whose etags another one replaced meanwhile
+    fake_stubby(report_etags=True, check_etags=True, running_seconds=[0.05, 0.15])
+    export = str(tmp_path / "abel_export.yaml")
+    generate_synthetic_export.write_export(export, reporting=8, virtual=8, fan_out=3)
+    building_config = str(tmp_path / "building_config.yaml")
+    shutil.copy(export, building_config)
+    process_ABEL_output.process_file(export, workers=1)
+    files = split_files(str(tmp_path))
+
+    execute_API_calls_series.onboard_config_files(
+        "US-BNC-SYN", files, building_config, max_workers=8, preflight_workers=1,
+        retry_policy=onboard_retry.RetryPolicy(max_retries=0))
+
+    rows = run_state.open_store(str(tmp_path / "results")).statuses(files)
+    assert len(rows) == len(files)
+    assert [row["error"] for row in rows.values() if row["status"] != run_state.SUCCEEDED] == []
@@ -0,0 +1,21 @@
+import random
+
+import pytest
+
+import telemetry
+
+
+@pytest.mark.parametrize("fraction, expected", [(0.5, 50), (0.95, 95), (0.99, 99), (0.07, 7), (0.29, 29), (1.0, 100)])
+def test_percentile_of_1_to_100(fraction, expected):
+    values = list(range(1, 101))
+    random.Random(0).shuffle(values)
+    assert telemetry.percentile(values, fraction) == expected
+
+
+@pytest.mark.parametrize("fraction, expected", [(0.5, 5), (0.9, 9), (0.95, 10), (0.99, 10), (0.3, 3), (0.0, 1)])
+def test_percentile_is_nearest_rank(fraction, expected):
+    assert telemetry.percentile([7, 3, 10, 1, 5, 9, 2, 8, 4, 6], fraction) == expected
+
+
+def test_percentile_of_one_value():
+    assert telemetry.percentile([2.5], 0.99) == 2.5
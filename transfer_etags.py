@@ -1,45 +1,248 @@
-import yaml
+import json
+import os
+import re
+import threading
+import telemetry
+from yaml_io import SingleQuoted, inline_scalar, load_yaml_file, render_config
 
-# Helper to force single-quoted YAML string
-class SingleQuoted(str):
-    pass
 
-def single_quoted_representer(dumper, data):
-    return dumper.represent_scalar('tag:yaml.org,2002:str', data, style="'")
+# ----------------------------
+# GUID -> etag index
+# ----------------------------
+ETAG_INDEX_SUFFIX = ".etag_index.json"
+ETAG_OVERLAY_SUFFIX = ".etag_overlay.json"
 
-yaml.add_representer(SingleQuoted, single_quoted_representer)
+# In-process cache: absolute config path -> (signature, {guid: etag or None}), overlay already applied
+_etag_index_cache = {}
+
+# Etags that changed since the building config was exported: absolute config path ->
+# {"signature": ..., "etags": {guid: etag}, "stale": set of guids whose new etag is unknown}
+_etag_overlays = {}
+_overlay_lock = threading.Lock()
+
+
+def etag_index_path(full_building_config_file):
+    """Location of the persisted etag index, stored next to the building config."""
+    return full_building_config_file + ETAG_INDEX_SUFFIX
+
+
+def _config_signature(full_building_config_file):
+    st = os.stat(full_building_config_file)
+    return [os.path.abspath(full_building_config_file), st.st_mtime_ns, st.st_size]
 
-def sync_etags(full_building_config_file, target_file):
-    # Load both YAMLs
-    with open(full_building_config_file, 'r') as f:
-        full_building_data = yaml.safe_load(f)
 
-    with open(target_file, 'r') as f:
-        target_data = yaml.safe_load(f)
+def _save_etag_index(full_building_config_file, signature, etags):
+    index_file = etag_index_path(full_building_config_file)
+    tmp_file = index_file + ".tmp"
+    try:
+        with open(tmp_file, "w") as f:
+            json.dump({"signature": signature, "etags": etags}, f, separators=(",", ":"))
+        os.replace(tmp_file, index_file)
+    except OSError as e:
+        print(f"Warning: couldn't persist etag index {index_file}: {e}")
 
-    total_entities = 0
-    updated_count = 0
 
-    # Walk through UUIDs
-    for uuid, target_entity in target_data.items():
+def build_etag_index(full_building_config_file):
+    """Parse the building config once and persist a GUID -> etag index next to it.
+
+    GUIDs present in the config without an etag map to None.
+    """
+    full_building_data = load_yaml_file(full_building_config_file)
+
+    etags = {}
+    for uuid, entity in full_building_data.items():
         if uuid == "CONFIG_METADATA":
             continue
-        total_entities += 1
-        if uuid in full_building_data and "etag" in full_building_data[uuid]:
-            target_entity["etag"] = SingleQuoted(str(full_building_data[uuid]["etag"]))
-            updated_count += 1
-        elif uuid not in full_building_data:
-            print(f"Warning: UUID {uuid} not found in full building config file")
-
-    # Overwrite the original target file
-    with open(target_file, 'w') as f:
-        yaml.dump(target_data, f, sort_keys=False)
-
-    # Post-process: replace true/false with ON/OFF
-    with open(target_file, 'r') as f:
-        content = f.read()
-    content = content.replace("true", "ON").replace("false", "OFF")
-    with open(target_file, 'w') as f:
-        f.write(content)
-
-    print(f"Processed {total_entities} entities in config file, successfully updated {updated_count} etags")
\ No newline at end of file
+        if isinstance(entity, dict) and "etag" in entity:
+            etags[uuid] = str(entity["etag"])
+        else:
+            etags[uuid] = None
+    return store_etag_index(full_building_config_file, etags)
+
+
+def store_etag_index(full_building_config_file, etags):
+    """Persist and cache an already-computed GUID -> etag index for the config as it is now on disk."""
+    signature = _config_signature(full_building_config_file)
+    _save_etag_index(full_building_config_file, signature, etags)
+    etags.update(_load_overlay(full_building_config_file, signature)["etags"])
+    _etag_index_cache[signature[0]] = (signature, etags)
+    return etags
+
+
+# Top-level "key:" lines and indented "etag: value" lines of a block-style config
+_SCAN_LINE = re.compile(rb"^(?:([^\s#-][^\n]*?)|( +)etag:[ \t]*([^\n]*?))[ \t]*\r?$", re.M)
+
+
+def scan_etags(buffer):
+    """GUID -> etag index from a line scan of a building config (bytes or mmap), without parsing it.
+
+    Returns None if the file uses any layout the scanner can't vouch for; callers then fall
+    back to build_etag_index.
+    """
+    etags = {}
+    guid = None
+    for key_line, indent, value in _SCAN_LINE.findall(buffer):
+        if key_line:
+            if not key_line.endswith(b":") or key_line[:1] in (b"'", b'"', b"?") or b": " in key_line:
+                return None
+            guid = key_line[:-1].decode("utf-8")
+            if guid != "CONFIG_METADATA":
+                etags[guid] = None
+        elif guid is not None and guid != "CONFIG_METADATA":
+            if len(indent) != 2:
+                return None
+            etag = inline_scalar(value)
+            if etag is None:
+                return None
+            # Plain etags may resolve to ints; str() them like build_etag_index
+            etags[guid] = str(etag)
+    return etags
+
+
+def load_etag_index(full_building_config_file):
+    """Return the GUID -> etag index for a building config, rebuilding it if the config changed."""
+    signature = _config_signature(full_building_config_file)
+
+    cached = _etag_index_cache.get(signature[0])
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    index_file = etag_index_path(full_building_config_file)
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, 'r') as f:
+                stored = json.load(f)
+            if stored.get("signature") == signature:
+                etags = stored["etags"]
+                etags.update(_load_overlay(full_building_config_file, signature)["etags"])
+                _etag_index_cache[signature[0]] = (signature, etags)
+                return etags
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: couldn't read etag index {index_file}, rebuilding: {e}")
+
+    return build_etag_index(full_building_config_file)
+
+
+# ----------------------------
+# Etag overlay
+# ----------------------------
+def etag_overlay_path(full_building_config_file):
+    return full_building_config_file + ETAG_OVERLAY_SUFFIX
+
+
+def _load_overlay(full_building_config_file, signature):
+    """Overlay for this exact export; overlays left over from an older export are discarded."""
+    with _overlay_lock:
+        overlay = _etag_overlays.get(signature[0])
+        if overlay is not None and overlay["signature"] == signature:
+            return overlay
+        overlay = {"signature": signature, "etags": {}, "stale": set()}
+        overlay_file = etag_overlay_path(full_building_config_file)
+        if os.path.exists(overlay_file):
+            try:
+                with open(overlay_file, "r") as f:
+                    stored = json.load(f)
+                if stored.get("signature") == signature:
+                    overlay["etags"] = stored["etags"]
+                    overlay["stale"] = set(stored["stale"])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: couldn't read etag overlay {overlay_file}, ignoring it: {e}")
+        _etag_overlays[signature[0]] = overlay
+        return overlay
+
+
+def _save_overlay(full_building_config_file, overlay):
+    overlay_file = etag_overlay_path(full_building_config_file)
+    tmp_file = overlay_file + ".tmp"
+    try:
+        with open(tmp_file, "w") as f:
+            json.dump({"signature": overlay["signature"], "etags": overlay["etags"],
+                       "stale": sorted(overlay["stale"])}, f, separators=(",", ":"))
+        os.replace(tmp_file, overlay_file)
+    except OSError as e:
+        print(f"Warning: couldn't persist etag overlay {overlay_file}: {e}")
+
+
+_RESULT_GUID = re.compile(r"\b(?:guid|entity_guid)\s*:\s*['\"]?([^'\"\s}]+)")
+_RESULT_ETAG = re.compile(r"\betag\s*:\s*['\"]?([^'\"\s}]+)")
+
+
+def parse_result_etags(result_text):
+    """Extract {guid: etag} pairs reported in an OnboardBuilding operation result, if any.
+
+    Each etag is paired with the closest preceding guid field.
+    """
+    etags = {}
+    guid = None
+    for match in re.finditer(f"{_RESULT_GUID.pattern}|{_RESULT_ETAG.pattern}", result_text):
+        if match.group(1) is not None:
+            guid = match.group(1)
+        elif guid is not None:
+            etags[guid] = match.group(2)
+            guid = None
+    return etags
+
+
+def record_onboarded_etags(full_building_config_file, guids, result_text):
+    """After a successful onboard, take the new etags of guids from the operation result.
+
+    GUIDs the result doesn't report an etag for are marked stale; sync_etags reports them so
+    the caller can refresh the building config before they are sent again. Returns the number
+    of etags updated.
+    """
+    signature = _config_signature(full_building_config_file)
+    etags = load_etag_index(full_building_config_file)
+    overlay = _load_overlay(full_building_config_file, signature)
+    reported = parse_result_etags(result_text)
+    updated = 0
+    with _overlay_lock:
+        for guid in guids:
+            if guid in reported:
+                etags[guid] = overlay["etags"][guid] = reported[guid]
+                overlay["stale"].discard(guid)
+                updated += 1
+            else:
+                overlay["stale"].add(guid)
+        _save_overlay(full_building_config_file, overlay)
+    return updated
+
+
+def stale_guids(full_building_config_file, guids):
+    """GUIDs among guids whose etag in the building config is known to be out of date."""
+    stale = _load_overlay(full_building_config_file, _config_signature(full_building_config_file))["stale"]
+    return [guid for guid in guids if guid in stale]
+
+
+# ----------------------------
+# Sync
+# ----------------------------
+def sync_etags(full_building_config_file, target_file):
+    """Copy etags from the building config into target_file; returns the GUIDs whose etag is stale."""
+    with telemetry.span("sync_etags", file=target_file) as record:
+        etags = load_etag_index(full_building_config_file)
+
+        target_data = load_yaml_file(target_file)
+
+        total_entities = 0
+        updated_count = 0
+
+        # Walk through UUIDs
+        for uuid, target_entity in target_data.items():
+            if uuid == "CONFIG_METADATA":
+                continue
+            total_entities += 1
+            if uuid not in etags:
+                print(f"Warning: UUID {uuid} not found in full building config file")
+            elif etags[uuid] is not None:
+                target_entity["etag"] = SingleQuoted(etags[uuid])
+                updated_count += 1
+
+        # Overwrite the original target file
+        content = render_config(target_data, spacing=False, allow_unicode=False)
+        with open(target_file, 'w') as f:
+            f.write(content)
+
+        stale = stale_guids(full_building_config_file, target_data)
+        record.update(guids=total_entities, updated=updated_count, stale=len(stale), bytes=len(content))
+    print(f"Processed {total_entities} entities in config file, successfully updated {updated_count} etags")
+    return stale
@@ -0,0 +1,35 @@
+"""Map a function over many items in a process pool, sharing one read-only value with every worker.
+
+The shared value (a rendered header, an etag index) is handed to each worker
+once through the pool initializer instead of being pickled with every item.
+Small batches run in this process: below min_items a pool costs more to start
+than it saves.
+"""
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+PARALLEL_MIN_ITEMS = 64
+
+_shared = None
+
+
+def _set_shared(shared):
+    global _shared
+    _shared = shared
+
+
+def _call_with_shared(fn, item):
+    return fn(_shared, item)
+
+
+def map_shared(fn, shared, items, workers=1, min_items=PARALLEL_MIN_ITEMS):
+    """[fn(shared, item) for item in items], in up to workers processes; returns (results, workers used).
+
+    fn must be a module-level function so it can be sent to the workers.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) < min_items:
+        return [fn(shared, item) for item in items], 1
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_set_shared, initargs=(shared,)) as executor:
+        return list(executor.map(functools.partial(_call_with_shared, fn), items, chunksize=chunksize)), workers
@@ -0,0 +1,42 @@
+"""Locate top-level blocks of a YAML building config without parsing the whole file.
+
+A block starts at a non-indented `key:` line and runs up to the next one, the
+same boundary rule split_large_configs.split_config_file uses. Offsets are in
+bytes so blocks can be re-read later with a seek.
+"""
+from yaml_io import load_yaml
+
+_NOT_A_KEY_START = (b" ", b"\t", b"#", b"-", b"\r", b"\n", b"")
+
+
+def is_top_level_key(line):
+    """True if a raw (bytes) line opens a new top-level block."""
+    return line[:1] not in _NOT_A_KEY_START and b":" in line
+
+
+def iter_top_level_blocks(f):
+    """Yield (offset, length) for each top-level block of a file opened in binary mode."""
+    start = None
+    offset = 0
+    for line in f:
+        if is_top_level_key(line):
+            if start is not None:
+                yield start, offset - start
+            start = offset
+        offset += len(line)
+    if start is not None:
+        yield start, offset - start
+
+
+def read_raw(f, offset, length):
+    """Bytes of one top-level block."""
+    f.seek(offset)
+    return f.read(length)
+
+
+def read_block(f, offset, length):
+    """Parse one top-level block; returns (key, content)."""
+    parsed = load_yaml(read_raw(f, offset, length).decode("utf-8"))
+    if not isinstance(parsed, dict) or len(parsed) != 1:
+        raise ValueError(f"Block at byte {offset} is not a single top-level entry")
+    return next(iter(parsed.items()))
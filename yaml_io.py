@@ -0,0 +1,103 @@
+"""Shared YAML I/O layer.
+
+Uses the libyaml-backed CSafeLoader/CSafeDumper when PyYAML was built with
+libyaml, and falls back to the pure-Python SafeLoader/SafeDumper otherwise.
+Both produce identical output for the data these scripts handle.
+"""
+import yaml
+
+try:
+    from yaml import CSafeLoader as _BaseLoader, CSafeDumper as _BaseDumper
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeLoader as _BaseLoader, SafeDumper as _BaseDumper
+    LIBYAML = False
+
+
+class Loader(_BaseLoader):
+    pass
+
+
+class Dumper(_BaseDumper):
+    pass
+
+
+# Helper to force single-quoted YAML string
+class SingleQuoted(str):
+    pass
+
+
+def single_quoted_representer(dumper, data):
+    # The C emitter only accepts exact str values, not subclasses
+    return dumper.represent_scalar('tag:yaml.org,2002:str', str(data), style="'")
+
+
+Dumper.add_representer(SingleQuoted, single_quoted_representer)
+
+
+class ConfigDumper(Dumper):
+    """Dumper for building config files: booleans as ON/OFF, dict subclasses as plain mappings."""
+    pass
+
+
+def on_off_representer(dumper, data):
+    return dumper.represent_scalar('tag:yaml.org,2002:bool', "ON" if data else "OFF")
+
+
+ConfigDumper.add_representer(bool, on_off_representer)
+ConfigDumper.add_multi_representer(dict, Dumper.represent_dict)
+
+
+def load_yaml(stream):
+    """Parse a YAML document from a string or open file."""
+    return yaml.load(stream, Loader=Loader)
+
+
+def load_yaml_file(path):
+    with open(path, "r") as f:
+        return load_yaml(f)
+
+
+_STR_TAG = "tag:yaml.org,2002:str"
+_resolver = yaml.resolver.Resolver()
+
+
+def inline_scalar(value):
+    """Decode a simple inline scalar (bytes after "key: ") as the loader would, or None if it can't tell.
+
+    Quoted scalars decode to str; plain ones resolve like the loader's (str, int, float or bool).
+    Anything that needs the full parser (flow style, anchors, tags, block scalars, escapes,
+    trailing comments, null) gives None.
+    """
+    if not value:
+        return None
+    if len(value) >= 2 and value[:1] == value[-1:] == b"'":
+        return value[1:-1].replace(b"''", b"'").decode("utf-8")
+    if len(value) >= 2 and value[:1] == value[-1:] == b'"' and b"\\" not in value:
+        return value[1:-1].decode("utf-8")
+    if value[:1] in b"'\"&*!|>{[#%@`" or b" #" in value:
+        return None
+    text = value.decode("utf-8")
+    if _resolver.resolve(yaml.ScalarNode, text, (True, False)) == _STR_TAG:
+        return text
+    return load_yaml(text)
+
+
+def add_top_level_spacing(text):
+    """Insert a blank line between consecutive non-indented lines, as the configs have always been laid out."""
+    lines = text.splitlines(keepends=True)
+    out = []
+    for i, line in enumerate(lines):
+        out.append(line)
+        if i + 1 < len(lines):
+            next_line = lines[i + 1]
+            if line.strip() and not line.startswith(" ") and next_line.strip() and not next_line.startswith(" "):
+                out.append("\n")
+    return "".join(out)
+
+
+def render_config(data, spacing=True, allow_unicode=True):
+    """Render a building config to its final text in memory, ready to be written once."""
+    text = yaml.dump(data, Dumper=ConfigDumper, default_flow_style=False, sort_keys=False,
+                     allow_unicode=allow_unicode)
+    return add_top_level_spacing(text) if spacing else text